@@ -1,38 +1,74 @@
 """Authentication middleware and decorators"""
 
+import hashlib
 from functools import wraps
 from datetime import datetime, timedelta, timezone
 from flask import request, jsonify, g
 from database import get_db
+from core import TTLCache
 
+# Session token -> user cache so authenticated requests skip the sessions/users
+# lookup. Each Gunicorn worker has its own copy and invalidation is local, so
+# another worker may serve a logged-out or deleted user, or a stale role or
+# ocr_enabled, until the entry expires. Admin routes bypass the cache.
+SESSION_CACHE_TTL_SEC = 30
+_session_cache = TTLCache(maxsize=10_000, ttl=SESSION_CACHE_TTL_SEC)
+
+
+# Sessions store expires_at as naive WIB (UTC+7) time
+_WIB = timezone(timedelta(hours=7))
+
+
+def _token_key(token: str) -> bytes:
+    # Hash so raw session tokens are never held in process memory
+    return hashlib.sha256(token.encode("utf-8")).digest()
 
-def get_current_user():
-    """Get current authenticated user from session token with expiry check"""
-    db = get_db()
 
-    # Support multiple token sources: Authorization header (Bearer), X-Session-Token, or cookie
-    token = None
+def get_request_token():
+    """Extract session token from Authorization (Bearer), X-Session-Token, or cookie"""
     auth_header = request.headers.get("Authorization")
-    # Removed: Debug logging of auth header to prevent token exposure
     if auth_header and auth_header.startswith("Bearer "):
         token = auth_header.split(" ")[1]
-    if not token:
-        token = request.headers.get("X-Session-Token")
-    if not token:
-        token = request.cookies.get("session_token")
+        if token:
+            return token
+    return request.headers.get("X-Session-Token") or request.cookies.get(
+        "session_token"
+    )
+
 
+def invalidate_session(token: str) -> None:
+    """Forget a cached session (call after deleting it)"""
+    if token:
+        _session_cache.pop(_token_key(token))
+
+
+def invalidate_user_sessions(user_id: int) -> None:
+    """Forget all cached sessions of a user in this worker (logout-all, role
+    change, deletion); other workers keep theirs for up to the TTL"""
+    _session_cache.pop_where(lambda _key, entry: entry["user"]["id"] == user_id)
+
+
+def get_current_user(use_cache: bool = True):
+    """Get current authenticated user from session token with expiry check"""
+    # Removed: Debug logging of auth header to prevent token exposure
+    token = get_request_token()
     if not token:
         return None
 
+    key = _token_key(token)
+    cached = _session_cache.get(key) if use_cache else None
+    if cached is not None:
+        exp_dt = cached["expires_at"]
+        if exp_dt is None or exp_dt >= datetime.now(_WIB).replace(
+            tzinfo=None
+        ):
+            return dict(cached["user"])
+        _session_cache.pop(key)
+
+    db = get_db()
+
     # Database query
-    cur = db.execute(
-        """
-        SELECT users.id, users.name, users.email, users.role, sessions.expires_at
-        FROM sessions JOIN users ON sessions.user_id = users.id
-        WHERE sessions.session_token = %s
-        """,
-        (token,),
-    )
+    cur = db.execute_prepared("session_user", (token,))
     row = cur.fetchone()
 
     if not row:
@@ -40,6 +76,7 @@ def get_current_user():
 
     # Expiry check
     expires_at = row["expires_at"]
+    exp_dt = None
     if expires_at:
         try:
             # Handle both datetime object (PostgreSQL) and string (SQLite)
@@ -53,24 +90,23 @@ def get_current_user():
                     exp_dt = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
 
             # Compare in WIB to match stored timezone policy
-            wib_now = datetime.now(timezone(timedelta(hours=7))).replace(tzinfo=None)
+            wib_now = datetime.now(_WIB).replace(tzinfo=None)
             if exp_dt < wib_now:
-                # Session expired -> remove it
-                db.execute("DELETE FROM sessions WHERE session_token = %s", (token,))
-                db.commit()
+                # Session expired (row is purged by the background cleanup job)
                 return None
         except Exception:
             # If parsing fails treat as invalid / expired
-            db.execute("DELETE FROM sessions WHERE session_token = %s", (token,))
-            db.commit()
             return None
 
-    return {
+    user = {
         "id": row["id"],
         "name": row["name"],
         "email": row["email"],
         "role": row["role"],
+        "ocr_enabled": bool(row["ocr_enabled"]),
     }
+    _session_cache.set(key, {"user": user, "expires_at": exp_dt})
+    return dict(user)
 
 
 def require_login(f):
@@ -92,7 +128,9 @@ def require_admin(f):
 
     @wraps(f)
     def wrapper(*args, **kwargs):
-        user = get_current_user()
+        # Always read the role from the DB: a demotion or deletion on another
+        # worker must not leave admin access open for the cache TTL
+        user = get_current_user(use_cache=False)
         if not user:
             return jsonify({"error": "Unauthorized"}), 401
         if user.get("role") != "admin":
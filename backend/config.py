@@ -40,9 +40,22 @@ APP_URL = os.environ.get("APP_URL", "http://localhost:8000")
 FLASK_CONFIG = {
     "SQLALCHEMY_DATABASE_URI": DATABASE_URL or f"sqlite:///{DB_PATH}",
     "SQLALCHEMY_TRACK_MODIFICATIONS": False,
+    "SQLALCHEMY_ENGINE_OPTIONS": {
+        "pool_size": int(os.environ.get("DB_POOL_SIZE", "20")),
+        "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "30")),
+        # No SELECT 1 per checkout; recycling handles Neon dropping idle connections
+        "pool_pre_ping": False,
+        "pool_recycle": 240,
+        "pool_timeout": 10,
+    },
     "SECRET_KEY": os.environ.get("SECRET_KEY", "dev-secret-key"),
+    # Only enable behind a proxy that understands X-Sendfile (Apache/lighttpd)
+    "USE_X_SENDFILE": os.environ.get("USE_X_SENDFILE", "false").lower() == "true",
 }
 
+# nginx internal location for uploads (e.g. "/internal-uploads"); empty = serve from Flask
+UPLOADS_ACCEL_PREFIX = os.environ.get("UPLOADS_ACCEL_PREFIX", "").rstrip("/")
+
 # reCAPTCHA (optional)
 RECAPTCHA_SITE_KEY = os.environ.get("RECAPTCHA_SITE_KEY", "")
 RECAPTCHA_SECRET_KEY = os.environ.get("RECAPTCHA_SECRET_KEY", "")
@@ -6,15 +6,28 @@ Modules:
 - logger: Structured logging configuration
 - error_handler: Error handling middleware
 - validators: Input validation utilities
+- json_provider: Fast JSON provider for Flask responses and JSON helpers
+- cache: Thread-safe in-process TTL cache
+- passwords: Argon2id password hashing with legacy hash support
 """
 
 from .logger import get_logger
 from .error_handler import handle_errors
 from .validators import TransactionValidator, ValidationError
+from .json_provider import configure_json_provider, json_dumps, json_loads
+from .cache import TTLCache
+from .passwords import hash_password, verify_password, needs_rehash
 
 __all__ = [
     "get_logger",
     "handle_errors",
     "TransactionValidator",
     "ValidationError",
+    "configure_json_provider",
+    "json_dumps",
+    "json_loads",
+    "TTLCache",
+    "hash_password",
+    "verify_password",
+    "needs_rehash",
 ]
@@ -0,0 +1,66 @@
+"""Fast JSON provider for Flask responses
+
+Uses orjson when installed and falls back to Flask's stdlib provider otherwise.
+Output stays compatible with the default provider (sorted keys, HTTP-date
+datetimes, Decimal as string).
+
+json_dumps/json_loads are the same orjson-or-stdlib choice for plain
+serialization outside responses (log metadata, LLM action payloads).
+"""
+
+import json
+from typing import Any
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """JSON provider backed by orjson"""
+
+    def _dumps_bytes(self, obj: Any, sort_keys: bool, indent: bool = False) -> bytes:
+        option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        sort_keys = kwargs.get("sort_keys", self.sort_keys)
+        indent = bool(kwargs.get("indent"))
+        return self._dumps_bytes(obj, sort_keys, indent).decode("utf-8")
+
+    def loads(self, s: Any, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
+    def response(self, *args: Any, **kwargs: Any):
+        # Hand orjson's bytes straight to the response (no str round-trip)
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        body = self._dumps_bytes(obj, self.sort_keys, indent) + b"\n"
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def configure_json_provider(app) -> None:
+    """Install the orjson provider on the app if orjson is available"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
+
+
+def json_dumps(obj: Any) -> str:
+    """Serialize obj to a compact JSON string"""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj)
+
+
+def json_loads(s: Any) -> Any:
+    """Parse a JSON str/bytes (raises ValueError on invalid input)"""
+    if orjson is not None:
+        return orjson.loads(s)
+    return json.loads(s)
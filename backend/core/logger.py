@@ -143,13 +143,19 @@ class StructuredLogger:
             0,
             event,
             (),
-            exc,
+            (type(exc), exc, exc.__traceback__) if exc is not None else None,
         )
         record.extra_data = context
         self.logger.handle(record)
 
+    def is_debug(self) -> bool:
+        """True when debug records would actually be emitted"""
+        return self.logger.isEnabledFor(logging.DEBUG)
+
     def debug(self, event: str, **context):
         """Log debug with context"""
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            return
         record = self.logger.makeRecord(
             self.logger.name,
             logging.DEBUG,
@@ -0,0 +1,39 @@
+"""Password hashing
+
+New hashes use Argon2id with an explicit cost instead of Werkzeug's default
+KDF. Hashes created earlier by Werkzeug (pbkdf2:/scrypt:) still verify and are
+reported by needs_rehash() so callers can upgrade them on the next login.
+"""
+
+from argon2 import PasswordHasher
+from argon2.exceptions import InvalidHashError, VerificationError
+from werkzeug.security import check_password_hash
+
+# OWASP-recommended Argon2id baseline: 19 MiB, 2 passes, 1 lane
+_hasher = PasswordHasher(time_cost=2, memory_cost=19 * 1024, parallelism=1)
+
+_ARGON2_PREFIX = "$argon2"
+
+
+def hash_password(password: str) -> str:
+    """Hash a password with Argon2id"""
+    return _hasher.hash(password)
+
+
+def verify_password(password_hash: str, password: str) -> bool:
+    """Check a password against an Argon2id or legacy Werkzeug hash"""
+    if not password_hash:
+        return False
+    if not password_hash.startswith(_ARGON2_PREFIX):
+        return check_password_hash(password_hash, password)
+    try:
+        return _hasher.verify(password_hash, password)
+    except (VerificationError, InvalidHashError):
+        return False
+
+
+def needs_rehash(password_hash: str) -> bool:
+    """True for legacy Werkzeug hashes and Argon2 hashes with outdated cost"""
+    if not password_hash.startswith(_ARGON2_PREFIX):
+        return True
+    return _hasher.check_needs_rehash(password_hash)
@@ -1,10 +1,100 @@
 """Database utilities and connection management - PostgreSQL only"""
 
+import itertools
 import os
+import re
+import threading
+import time
 from flask import g
 from config import SCHEMA_PATH
 import psycopg2
+import psycopg2.extensions
 import psycopg2.extras
+import psycopg2.pool
+
+# Per-process pool of psycopg2 connections handed out by get_db(). Each
+# gunicorn worker only runs a handful of threads, and Postgres throughput drops
+# once active backends exceed ~2x cores, so default to 2 * cores + 1 (max 10).
+DB_POOL_MAX = int(
+    os.environ.get("DB_POOL_MAX", str(min(2 * (os.cpu_count() or 1) + 1, 10)))
+)
+# psycopg2's pool raises when exhausted; callers queue this long for a free slot
+DB_POOL_WAIT_SEC = float(os.environ.get("DB_POOL_WAIT_SEC", "10"))
+# Neon closes idle connections; pooled ones idle longer than this are replaced
+# on checkout instead of pinging the server on every request
+DB_POOL_IDLE_SEC = int(os.environ.get("DB_POOL_IDLE_SEC", "240"))
+
+# Hot-path statements prepared once per connection (sent together with the
+# session setup, so no extra round-trip) and run via EXECUTE afterwards.
+PREPARED_STATEMENTS = {
+    "user_by_email": "SELECT id, name, email, password_hash, role FROM users WHERE email = %s",
+    "session_user": (
+        "SELECT users.id, users.name, users.email, users.role, users.ocr_enabled, sessions.expires_at "
+        "FROM sessions JOIN users ON sessions.user_id = users.id "
+        "WHERE sessions.session_token = %s"
+    ),
+    "insert_session": "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
+    # Sets the new hash and consumes the user's reset tokens when the token is
+    # valid; no row = unknown token, expired = true means nothing was changed
+    "reset_password": (
+        "WITH tok AS (SELECT user_id, expires_at < LOCALTIMESTAMP AS expired "
+        "FROM password_resets WHERE token = %s), "
+        "upd AS (UPDATE users SET password_hash = %s FROM tok "
+        "WHERE users.id = tok.user_id AND NOT tok.expired RETURNING users.id), "
+        "del AS (DELETE FROM password_resets WHERE user_id IN (SELECT id FROM upd)) "
+        "SELECT tok.user_id, tok.expired FROM tok"
+    ),
+    # Inserts unless the same transaction was recorded in the last 5 seconds
+    # (accidental double submit); returns no row when it was a duplicate
+    "insert_transaction": (
+        "WITH v (user_id, date, type, category, description, amount, account) AS ("
+        "VALUES (%s::integer, %s::date, %s::text, %s::text, %s::text, %s::numeric, %s::text)) "
+        "INSERT INTO transactions (user_id, date, type, category, description, amount, account) "
+        "SELECT * FROM v WHERE NOT EXISTS ("
+        "SELECT 1 FROM transactions t WHERE t.user_id = v.user_id AND t.date = v.date "
+        "AND t.type = v.type AND t.category = v.category AND t.amount = v.amount "
+        "AND t.account = v.account AND t.created_at >= LOCALTIMESTAMP - INTERVAL '5 seconds') "
+        "RETURNING id"
+    ),
+    "user_profile": (
+        "SELECT name, email, avatar_url, phone, bio, role, ocr_enabled, ai_provider, ai_model "
+        "FROM users WHERE id = %s"
+    ),
+    # NULL for ocr_enabled/ai_provider/ai_model keeps the stored value
+    "update_profile": (
+        "UPDATE users SET name = %s, phone = %s, bio = %s, "
+        "ocr_enabled = COALESCE(%s, ocr_enabled), ai_provider = COALESCE(%s, ai_provider), "
+        "ai_model = COALESCE(%s, ai_model) WHERE id = %s "
+        "RETURNING name, email, avatar_url, phone, bio, ocr_enabled, ai_provider, ai_model"
+    ),
+    # Chat history sidebar (session list, opening a session)
+    "user_sessions": (
+        "SELECT s.id, s.title, s.created_at, s.updated_at, "
+        "COUNT(l.id) AS message_count, MAX(l.created_at) AS last_message_at "
+        "FROM chat_sessions s LEFT JOIN llm_logs l ON s.id = l.session_id "
+        "WHERE s.user_id = %s GROUP BY s.id ORDER BY s.updated_at DESC"
+    ),
+    "chat_session": (
+        "SELECT id, title, created_at, updated_at FROM chat_sessions "
+        "WHERE id = %s AND user_id = %s"
+    ),
+    "session_messages": (
+        "SELECT id, role, content, created_at FROM llm_logs "
+        "WHERE session_id = %s ORDER BY created_at ASC, id ASC"
+    ),
+}
+
+
+def _numbered_params(query: str) -> str:
+    # PREPARE uses $1, $2, ... instead of %s
+    counter = itertools.count(1)
+    return re.sub(r"%s", lambda _m: f"${next(counter)}", query)
+
+
+_PREPARE_SQL = "; ".join(
+    f"PREPARE {name} AS {_numbered_params(sql)}"
+    for name, sql in PREPARED_STATEMENTS.items()
+)
 
 
 class _PgAdapter:
@@ -13,8 +103,9 @@ class _PgAdapter:
     so existing code using db.execute(...).fetchone()/fetchall() keeps working.
     """
 
-    def __init__(self, conn):
+    def __init__(self, conn, prepared=False):
         self._conn = conn
+        self._prepared = prepared
 
     def _convert_placeholders(self, query: str):
         # Convert SQLite-style placeholders (?) to psycopg2 (%s)
@@ -25,8 +116,20 @@ class _PgAdapter:
         cur.execute(self._convert_placeholders(query), params or ())
         return cur
 
-    def cursor(self):
-        return self._conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+    def execute_prepared(self, name: str, params=()):
+        """Run a statement from PREPARED_STATEMENTS (plain SQL if not prepared)"""
+        if not self._prepared:
+            return self.execute(PREPARED_STATEMENTS[name], params)
+        cur = self._conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        placeholders = ", ".join(["%s"] * len(params))
+        cur.execute(f"EXECUTE {name}({placeholders})", params)
+        return cur
+
+    def cursor(self, name=None):
+        # A name makes a server-side cursor that fetches rows in itersize chunks
+        return self._conn.cursor(
+            name=name, cursor_factory=psycopg2.extras.RealDictCursor
+        )
 
     def commit(self):
         self._conn.commit()
@@ -38,11 +141,48 @@ class _PgAdapter:
         self._conn.close()
 
 
-def get_db():
-    """Get PostgreSQL database connection from Flask g object"""
-    if "db" not in g:
-        conn = psycopg2.connect(os.environ.get("DATABASE_URL"))
-        # Ensure session timezone is Asia/Jakarta (WIB) so CURRENT_TIMESTAMP is in WIB
+class _PooledConnection(psycopg2.extensions.connection):
+    """psycopg2 connection that remembers its one-time session setup"""
+
+    prepared = None  # None until the session has been set up
+    last_used = 0.0
+
+
+_pool = None
+_pool_lock = threading.Lock()
+_pool_slots = threading.BoundedSemaphore(DB_POOL_MAX)
+
+
+def _get_pool():
+    # Created lazily so each gunicorn worker builds its own pool after fork
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = psycopg2.pool.ThreadedConnectionPool(
+                    1,
+                    DB_POOL_MAX,
+                    os.environ.get("DATABASE_URL"),
+                    connection_factory=_PooledConnection,
+                )
+    return _pool
+
+
+def _setup_session(conn):
+    """Run once per new connection (not per request)"""
+    # Ensure session timezone is Asia/Jakarta (WIB) so CURRENT_TIMESTAMP is in WIB,
+    # and prepare hot-path statements in the same round-trip
+    conn.prepared = False
+    try:
+        cur = conn.cursor()
+        cur.execute(f"SET TIME ZONE 'Asia/Jakarta'; {_PREPARE_SQL}")
+        conn.commit()
+        cur.close()
+        conn.prepared = True
+    except Exception as prep_err:
+        # Schema may not exist yet (first init_db run); fall back to plain SQL
+        conn.rollback()
+        print(f"[DB WARN] Failed to prepare statements: {prep_err}")
         try:
             cur = conn.cursor()
             cur.execute("SET TIME ZONE 'Asia/Jakarta'")
@@ -50,16 +190,63 @@ def get_db():
             cur.close()
         except Exception as tz_err:
             print(f"[DB WARN] Failed to set session timezone: {tz_err}")
+
+
+def _checkout():
+    if not _pool_slots.acquire(timeout=DB_POOL_WAIT_SEC):
+        raise psycopg2.pool.PoolError("timed out waiting for a pooled connection")
+    try:
+        pool = _get_pool()
+        while True:
+            conn = pool.getconn()
+            stale = (
+                conn.prepared is not None
+                and time.monotonic() - conn.last_used > DB_POOL_IDLE_SEC
+            )
+            if not conn.closed and not stale:
+                break
+            pool.putconn(conn, close=True)
+        if conn.prepared is None:
+            _setup_session(conn)
+        return conn
+    except Exception:
+        _pool_slots.release()
+        raise
+
+
+def _release(conn):
+    pool = _get_pool()
+    try:
+        if conn.closed:
+            pool.putconn(conn, close=True)
+            return
+        try:
+            # Never hand out a connection with an open or failed transaction
+            status = conn.get_transaction_status()
+            if status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.last_used = time.monotonic()
+            pool.putconn(conn)
+        except Exception:
+            pool.putconn(conn, close=True)
+    finally:
+        _pool_slots.release()
+
+
+def get_db():
+    """Get a pooled PostgreSQL connection for this request from Flask g object"""
+    if "db" not in g:
+        conn = _checkout()
         # Wrap with adapter that exposes .execute/.commit like sqlite3
-        g.db = _PgAdapter(conn)
+        g.db = _PgAdapter(conn, prepared=conn.prepared)
     return g.db
 
 
 def close_db(exc=None):
-    """Close database connection"""
+    """Return the request's database connection to the pool"""
     db = g.pop("db", None)
     if db is not None:
-        db.close()
+        _release(db._conn)
 
 
 def init_db(standalone=False):
@@ -68,7 +255,7 @@ def init_db(standalone=False):
     Args:
         standalone: If True, creates connection directly without Flask's g object
     """
-    from werkzeug.security import generate_password_hash
+    from core import hash_password
 
     if standalone:
         # Direct connection without Flask's g
@@ -87,12 +274,10 @@ def init_db(standalone=False):
     with open(SCHEMA_PATH, "r", encoding="utf-8") as f:
         schema_sql = f.read()
 
-        # Execute PostgreSQL schema line by line
+        # Execute the whole PostgreSQL schema in one batch (splitting on ";"
+        # would break the plpgsql function bodies)
         cur = db.cursor()
-        for statement in schema_sql.split(";"):
-            statement = statement.strip()
-            if statement:
-                cur.execute(statement)
+        cur.execute(schema_sql)
         db.commit()
         cur.close()
 
@@ -192,7 +377,7 @@ def init_db(standalone=False):
             (ADMIN_EMAIL,),
         )
         if not cur.fetchone():
-            password_hash = generate_password_hash(ADMIN_PASSWORD)
+            password_hash = hash_password(ADMIN_PASSWORD)
             cur.execute(
                 "INSERT INTO users (name, email, password_hash, role, ocr_enabled) VALUES (%s, %s, %s, %s, %s)",
                 (
@@ -39,6 +39,16 @@ except Exception:
 
 logger = get_logger(__name__)
 
+_ADD_TRANSACTION_ACTIONS = frozenset(
+    {
+        "add_transaction",
+        "record_expense",
+        "record_income",
+        "add_expense",
+        "add_income",
+    }
+)
+
 
 def _parse_amount(val: Optional[str]) -> Optional[float]:
     """
@@ -113,43 +123,24 @@ def execute_action(
         )
 
         # ADD TRANSACTION (multiple aliases for compatibility)
-        if action_name in [
-            "add_transaction",
-            "record_expense",
-            "record_income",
-            "add_expense",
-            "add_income",
-        ]:
+        if action_name in _ADD_TRANSACTION_ACTIONS:
             return _execute_add_transaction(user_id, action_name, args, lang)
 
-        # CREATE SAVINGS GOAL
-        elif action_name == "create_savings_goal":
-            return _execute_create_savings_goal(user_id, args, lang)
-
-        # UPDATE TRANSACTION
-        elif action_name == "update_transaction":
-            return _execute_update_transaction(user_id, args, lang)
+        handler = _ACTION_HANDLERS.get(action_name)
+        if handler is not None:
+            return handler(user_id, args, lang)
 
-        # DELETE TRANSACTION
-        elif action_name == "delete_transaction":
-            return _execute_delete_transaction(user_id, args, lang)
-
-        # TRANSFER FUNDS
-        elif action_name == "transfer_funds":
-            return _execute_transfer_funds(user_id, args, lang)
-
-        else:
-            logger.warning("unknown_action", action=action_name, user_id=user_id)
-            unknown_msg = (
-                f"Aksi '{action_name}' tidak dikenal"
-                if lang == "id"
-                else f"Action '{action_name}' not recognized"
-            )
-            return {
-                "success": False,
-                "message": unknown_msg,
-                "code": "UNKNOWN_ACTION",
-            }
+        logger.warning("unknown_action", action=action_name, user_id=user_id)
+        unknown_msg = (
+            f"Aksi '{action_name}' tidak dikenal"
+            if lang == "id"
+            else f"Action '{action_name}' not recognized"
+        )
+        return {
+            "success": False,
+            "message": unknown_msg,
+            "code": "UNKNOWN_ACTION",
+        }
 
     except Exception as e:
         logger.error(
@@ -1003,10 +994,8 @@ def _execute_transfer_funds(
     # Check balance (prevent negative balance)
     db = get_db()
     cur_balance = db.execute(
-        """SELECT COALESCE(SUM(CASE WHEN type='income' THEN amount 
-                                    WHEN type='expense' THEN -amount 
-                                    ELSE 0 END), 0) as balance
-           FROM transactions WHERE user_id = %s AND account = %s""",
+        """SELECT COALESCE(SUM(balance), 0) as balance
+           FROM user_account_balances WHERE user_id = %s AND account = %s""",
         (user_id, from_account),
     ).fetchone()["balance"]
 
@@ -1099,11 +1088,11 @@ def _execute_transfer_funds(
             amount=amount,
         )
 
-        # Insert debit transaction from source account
+        # Debit from source and credit to target in one statement
         db.execute(
             """INSERT INTO transactions 
                (user_id, date, type, category, description, amount, account) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+               VALUES (%s, %s, %s, %s, %s, %s, %s), (%s, %s, %s, %s, %s, %s, %s)""",
             (
                 user_id,
                 normalized_date,
@@ -1112,15 +1101,6 @@ def _execute_transfer_funds(
                 f"Transfer to {to_account}: {description}",
                 amount,
                 from_account,
-            ),
-        )
-
-        # Insert credit transaction to target account
-        db.execute(
-            """INSERT INTO transactions 
-               (user_id, date, type, category, description, amount, account) 
-               VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-            (
                 user_id,
                 normalized_date,
                 "income",
@@ -1168,3 +1148,12 @@ def _execute_transfer_funds(
             "message": f"Gagal melakukan transfer: {str(e)}",
             "code": "TRANSFER_FAILED",
         }
+
+
+# Action name -> handler(user_id, args, lang); built once, looked up per call
+_ACTION_HANDLERS = {
+    "create_savings_goal": _execute_create_savings_goal,
+    "update_transaction": _execute_update_transaction,
+    "delete_transaction": _execute_delete_transaction,
+    "transfer_funds": _execute_transfer_funds,
+}
@@ -1,26 +1,59 @@
 """Financial Advisor - Main Application"""
 
+import base64
+import functools
+import hashlib
+import hmac
+import io
 import json
 import re
 import secrets
+import smtplib
 import os
+from concurrent.futures import ThreadPoolExecutor
+from string import Template
+from urllib.parse import quote
 from datetime import datetime, date, timedelta, timezone
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
 
 try:
     import google.generativeai as genai
 except Exception:
     genai = None  # Optional: allow running without Google Generative AI
-from flask import Flask, request, jsonify, send_from_directory, g
+try:
+    from sendgrid import SendGridAPIClient
+    from sendgrid.helpers.mail import Mail
+except Exception:
+    SendGridAPIClient = None  # Optional: fall back to SMTP without SendGrid
+    Mail = None
+from flask import (
+    Flask,
+    Response,
+    request,
+    jsonify,
+    send_from_directory,
+    g,
+    abort,
+    stream_with_context,
+)
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 from openai import OpenAI
+from psycopg2.errors import UniqueViolation
 import requests as http_requests
-from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.security import safe_join
 
 # Import modular components
-from auth import require_login, require_admin
+from auth import (
+    require_login,
+    require_admin,
+    get_request_token,
+    invalidate_session,
+    invalidate_user_sessions,
+)
 from config import (
     BASE_DIR,
     FLASK_CONFIG,
@@ -33,6 +66,7 @@ from config import (
     APP_URL,
     RECAPTCHA_SITE_KEY,
     RECAPTCHA_SECRET_KEY,
+    UPLOADS_ACCEL_PREFIX,
 )
 from database import get_db, close_db, init_db
 from financial_context import get_month_summary, build_financial_context
@@ -43,15 +77,41 @@ from llm import (
     get_system_prompt,
     call_llm_with_retry,
 )
-from memory import build_memory_context, log_message, maybe_update_summary
+from memory import build_memory_context, log_message
 from routes.memory_routes import memory_bp
-from core import get_logger
-from services import ConversationStateManager
+from core import (
+    get_logger,
+    configure_json_provider,
+    json_loads,
+    TTLCache,
+    hash_password,
+    verify_password,
+    needs_rehash,
+)
+from services import (
+    ConversationStateManager,
+    flush_logs,
+    schedule_summary_update,
+    start_expiry_cleanup,
+)
 from llm import validate_action_arguments
 
 SENDGRID_API_KEY = os.getenv("SENDGRID_API_KEY")
 logger = get_logger(__name__)
 
+# Western Indonesia Time (UTC+7), the app's timezone policy
+_WIB = timezone(timedelta(hours=7))
+# Naive WIB timestamp format used for expires_at columns
+SQL_DT_FMT = "%Y-%m-%d %H:%M:%S"
+
+# Worker pool for slow, GIL-releasing work (password KDF) kept off the request path
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="smartbudget-bg")
+# Separate pool for outgoing email so slow SMTP/SendGrid calls never queue
+# behind (or starve) password hashing
+_email_executor = ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix="smartbudget-email"
+)
+
 # Translation messages for API responses
 MESSAGES = {
     "id": {
@@ -89,76 +149,91 @@ MESSAGES = {
 }
 
 
+def _parse_sql_dt(value):
+    """Parse an expires_at value (datetime from PostgreSQL or legacy string)"""
+    if isinstance(value, datetime):
+        return value
+    try:
+        # C-implemented, much cheaper than strptime
+        return datetime.fromisoformat(value.replace("Z", ""))
+    except ValueError:
+        return datetime.strptime(value, SQL_DT_FMT)
+
+
 def get_language():
     """Get language from request (query param or Accept-Language header)"""
-    lang = request.args.get("lang") or request.headers.get("Accept-Language", "id")
-    if lang.startswith("en"):
-        return "en"
-    return "id"
+    lang = g.get("_lang")
+    if lang is not None:
+        return lang
+    raw = request.args.get("lang") or request.headers.get("Accept-Language", "id")
+    lang = "en" if raw.startswith("en") else "id"
+    g._lang = lang
+    return lang
+
+
+# Flattened (lang, key) -> message table so lookups are a single hash. Keys
+# missing in a language are pre-filled with the Indonesian text, so only an
+# unknown lang or key needs a second lookup.
+_MESSAGES_FLAT = {
+    (lang, key): text or MESSAGES["id"].get(key, "")
+    for lang, table in MESSAGES.items()
+    for key, text in {**MESSAGES["id"], **table}.items()
+}
 
 
 def get_message(key, lang=None):
     """Get translated message by key"""
     if lang is None:
         lang = get_language()
-    return MESSAGES.get(lang, MESSAGES["id"]).get(key, MESSAGES["id"].get(key, ""))
+    text = _MESSAGES_FLAT.get((lang, key))
+    if text is None:
+        text = _MESSAGES_FLAT.get(("id", key), "")
+    return text
 
 
 # === SECURITY: SANITIZE LOGGING ===
+_SENSITIVE_KEY_RE = re.compile(r"password|token|api_key|secret|otp|pin", re.IGNORECASE)
+
+
 def sanitize_for_logging(data: dict) -> dict:
     """Sanitize sensitive data for logging by masking passwords and tokens"""
     if not isinstance(data, dict):
         return data
 
-    sanitized = data.copy()
-    sensitive_keys = ["password", "token", "api_key", "secret", "otp", "pin"]
-
-    for key in sanitized:
-        # Check if key contains sensitive information
-        if any(sensitive in key.lower() for sensitive in sensitive_keys):
-            if sanitized[key]:
-                sanitized[key] = "***REDACTED***"
-
-    return sanitized
-
-
-def _dedupe_recent_transaction(
-    db,
-    user_id: int,
-    date_str: str,
-    tx_type: str,
-    category: str,
-    amount: float,
-    account: str,
-    window_seconds: int = 5,
-):
-    """Prevent accidental double-record within a short window."""
-    try:
-        row = db.execute(
-            """
-            SELECT id, created_at FROM transactions
-            WHERE user_id = %s AND date = %s AND type = %s AND category = %s AND amount = %s AND account = %s
-            ORDER BY created_at DESC LIMIT 1
-            """,
-            (user_id, date_str, tx_type, category, amount, account),
-        ).fetchone()
-        if not row:
-            return None
-        created_at = row.get("created_at") if isinstance(row, dict) else row[1]
-        if not created_at:
-            return None
-        try:
-            ca = created_at
-            if isinstance(ca, str):
-                ca = datetime.fromisoformat(ca.replace("Z", ""))
-        except Exception:
-            return None
-        delta = datetime.now(timezone(timedelta(hours=7))) - ca
-        if delta.total_seconds() <= window_seconds:
-            return row["id"] if isinstance(row, dict) else row[0]
-    except Exception:
-        return None
-    return None
+    return {
+        key: "***REDACTED***"
+        if value and _SENSITIVE_KEY_RE.search(key)
+        else value
+        for key, value in data.items()
+    }
+
+
+# === SECURITY: FAILED LOGIN CACHE ===
+# Remember recently failed (email, password) guesses so repeated brute-force
+# attempts skip the slow password KDF. Only failures are cached. The stored
+# hash is part of the key, so a password change on any worker invalidates them.
+FAILED_LOGIN_TTL_SEC = 60
+_failed_logins = TTLCache(maxsize=2048, ttl=FAILED_LOGIN_TTL_SEC)
+
+
+def _failed_login_key(email: str, password: str, password_hash: str) -> bytes:
+    return hmac.new(
+        FLASK_CONFIG["SECRET_KEY"].encode("utf-8"),
+        f"{email}:{password_hash}:{password}".encode("utf-8"),
+        hashlib.sha256,
+    ).digest()
+
+
+def _new_token() -> str:
+    """Random URL-safe token for sessions and password resets (192 bits)"""
+    # 24 bytes encode to 32 base64 chars with no padding, so nothing to strip
+    return base64.urlsafe_b64encode(secrets.token_bytes(24)).decode("ascii")
+
+
+# Admin dashboard user list, refreshed at most every 30s per worker and
+# dropped whenever a user row is created, changed or deleted on that worker
+# (other workers may list the old rows until their copy expires)
+_admin_users_cache = TTLCache(maxsize=1, ttl=30)
 
 
 # Initialize Flask app
@@ -168,11 +243,21 @@ app = Flask(
     static_url_path="/static",
 )
 app.config.update(FLASK_CONFIG)
+configure_json_provider(app)
 
 db_sqlalchemy = SQLAlchemy(app)
 migrate = Migrate(app, db_sqlalchemy)
 app.teardown_appcontext(close_db)
 
+
+@app.after_request
+def _flush_request_logs(response):
+    # Rows queued by this request must be committed before the client can send
+    # a follow-up, which another Gunicorn worker (own queue) may serve
+    if g.pop("llm_logs_pending", False) and not flush_logs():
+        logger.warning("llm_logs_flush_timeout", path=request.path)
+    return response
+
 # Initialize rate limiter (per IP)
 limiter = Limiter(
     app=app,
@@ -184,6 +269,9 @@ limiter = Limiter(
 # Register blueprints
 app.register_blueprint(memory_bp)
 
+# Purge expired OTPs, reset tokens and sessions in the background
+start_expiry_cleanup()
+
 # Initialize LLM clients
 client = OpenAI()
 
@@ -214,6 +302,10 @@ def public_config():
     )
 
 
+# (connect, read) seconds: fail fast if Google is unreachable instead of pinning a worker
+RECAPTCHA_TIMEOUT = (1.5, 5)
+
+
 def verify_recaptcha_token(token: str, remote_ip: str = None) -> bool:
     """Verify a reCAPTCHA token with Google.
     Accepts v3 (score >= 0.5) and v2 success.
@@ -231,7 +323,7 @@ def verify_recaptcha_token(token: str, remote_ip: str = None) -> bool:
         r = http_requests.post(
             "https://www.google.com/recaptcha/api/siteverify",
             data=payload,
-            timeout=5,
+            timeout=RECAPTCHA_TIMEOUT,
         )
         data = r.json()
         if not data.get("success"):
@@ -246,17 +338,21 @@ def verify_recaptcha_token(token: str, remote_ip: str = None) -> bool:
 
 
 # --- Email Utilities ---
+def email_provider_configured() -> bool:
+    """True if SendGrid or SMTP is configured (otherwise emails run in dev mode)"""
+    if SENDGRID_API_KEY and SendGridAPIClient is not None:
+        return True
+    return all([SMTP_HOST, SMTP_USER, SMTP_PASSWORD])
+
+
 def send_email_sendgrid(
     to_email: str, subject: str, html_content: str, text_content: str
 ) -> bool:
     """Send email via SendGrid API. Returns True if sent, False on error."""
-    if not SENDGRID_API_KEY:
+    if not SENDGRID_API_KEY or SendGridAPIClient is None:
         return False
 
     try:
-        from sendgrid import SendGridAPIClient
-        from sendgrid.helpers.mail import Mail
-
         message = Mail(
             from_email=SMTP_FROM or "noreply@smartbudget.app",
             to_emails=to_email,
@@ -268,19 +364,23 @@ def send_email_sendgrid(
         sg = SendGridAPIClient(SENDGRID_API_KEY)
         response = sg.send(message)
 
-        print(f"[SENDGRID] Email sent to {to_email} (status: {response.status_code})")
+        logger.info(
+            "email_sent", via="sendgrid", to=to_email, status=response.status_code
+        )
         return True
     except Exception as e:
-        print(f"[SENDGRID ERROR] Failed to send email: {e}")
+        logger.error("email_send_failed", exc=e, via="sendgrid", to=to_email)
         return False
 
 
-def send_otp_email(to_email: str, otp_code: str, user_name: str) -> bool:
-    """Send OTP verification email. Returns True if sent, False if dev/no SMTP or error."""
-    greeting = f"Halo {user_name}," if user_name else "Halo,"
-    subject = "Kode Verifikasi Registrasi - SmartBudget Assistant"
+def _log_undelivered_email(future, kind: str, user_id: int) -> None:
+    """Done-callback for background sends: the request has already returned"""
+    if future.exception() is not None or not future.result():
+        logger.error("email_not_delivered", kind=kind, user_id=user_id)
 
-    html = f"""
+
+# Email bodies are static apart from a few slots, so build the templates once
+_OTP_HTML_TMPL = Template("""
         <!DOCTYPE html>
         <html>
           <head>
@@ -300,11 +400,11 @@ def send_otp_email(to_email: str, otp_code: str, user_name: str) -> bool:
                     </tr>
                     <tr>
                       <td style="padding: 40px 30px;">
-                        <p style="margin: 0 0 20px 0; color: #111827; font-size: 16px; line-height: 1.6;">{greeting}</p>
+                        <p style="margin: 0 0 20px 0; color: #111827; font-size: 16px; line-height: 1.6;">$greeting</p>
                         <p style="margin: 0 0 20px 0; color: #374151; font-size: 15px; line-height: 1.6;">Terima kasih telah mendaftar di SmartBudget Assistant! Gunakan kode verifikasi berikut untuk menyelesaikan pendaftaran Anda:</p>
                         <div style="background: #f3f4f6; border-radius: 12px; padding: 24px; text-align: center; margin: 30px 0;">
                           <p style="margin: 0 0 8px 0; color: #6b7280; font-size: 13px; font-weight: 600; text-transform: uppercase; letter-spacing: 0.5px;">Kode Verifikasi</p>
-                          <p style="margin: 0; color: #1e40af; font-size: 36px; font-weight: 700; letter-spacing: 8px; font-family: 'Courier New', monospace;">{otp_code}</p>
+                          <p style="margin: 0; color: #1e40af; font-size: 36px; font-weight: 700; letter-spacing: 8px; font-family: 'Courier New', monospace;">$otp_code</p>
                         </div>
                         <p style="margin: 0 0 20px 0; color: #374151; font-size: 15px; line-height: 1.6;">Kode ini akan kedaluwarsa dalam <strong>10 menit</strong>.</p>
                         <div style="background: #fef3c7; border-left: 4px solid #f59e0b; padding: 16px; border-radius: 8px; margin: 24px 0;">
@@ -324,13 +424,13 @@ def send_otp_email(to_email: str, otp_code: str, user_name: str) -> bool:
             </table>
           </body>
         </html>
-        """
+        """)
 
-    text = f"""{greeting}
+_OTP_TEXT_TMPL = Template("""$greeting
 
 Terima kasih telah mendaftar di SmartBudget Assistant!
 
-Kode Verifikasi Anda: {otp_code}
+Kode Verifikasi Anda: $otp_code
 
 Kode ini akan kedaluwarsa dalam 10 menit.
 
@@ -338,58 +438,9 @@ Jangan bagikan kode ini kepada siapa pun.
 
 Jika Anda tidak mendaftar, abaikan email ini.
 
-© 2025 SmartBudget Assistant"""
-
-    # Try SendGrid first
-    print(f"[EMAIL] Sending OTP to {to_email}...")
-    if send_email_sendgrid(to_email, subject, html, text):
-        return True
-
-    # Fallback to SMTP if SendGrid not configured
-    if not all([SMTP_HOST, SMTP_USER, SMTP_PASSWORD]):
-        print(
-            f"[DEV MODE] OTP sent to {to_email} (check console in production, OTP redacted for security)"
-        )
-        return False
-
-    try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-
-        msg = MIMEMultipart("alternative")
-        msg["Subject"] = subject
-        msg["From"] = SMTP_FROM
-        msg["To"] = to_email
-        msg.attach(MIMEText(text, "plain"))
-        msg.attach(MIMEText(html, "html"))
-
-        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=5) as server:
-            server.starttls()
-            server.login(SMTP_USER, SMTP_PASSWORD)
-            server.sendmail(SMTP_FROM, to_email, msg.as_string())
-
-        print(f"[EMAIL] OTP sent via SMTP to {to_email}")
-        return True
-    except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send OTP: {e}")
-        print(f"[DEV MODE FALLBACK] OTP sent to {to_email} (OTP redacted for security)")
-        return False
-
+© 2025 SmartBudget Assistant""")
 
-def send_password_reset_email(
-    to_email: str, reset_token: str, user_name: str = None
-) -> bool:
-    """Send password reset email. Returns True if email was sent, False if dev mode."""
-
-    print(f"[EMAIL] Sending reset email to {to_email}...")
-
-    reset_url = f"{APP_URL}/reset-password.html%stoken={reset_token}"
-    greeting = f"Halo {user_name}," if user_name else "Halo,"
-    subject = "Reset Password - SmartBudget Assistant"
-
-    # HTML email body with professional design
-    html = f"""
+_RESET_HTML_TMPL = Template("""
         <!DOCTYPE html>
         <html>
           <head>
@@ -418,10 +469,10 @@ def send_password_reset_email(
                     <tr>
                       <td style="padding: 40px 30px;">
                         <p style="margin: 0 0 20px 0; color: #111827; font-size: 16px; line-height: 1.6;">
-                          {greeting}
+                          $greeting
                         </p>
                         <p style="margin: 0 0 20px 0; color: #374151; font-size: 15px; line-height: 1.6;">
-                          Kami menerima permintaan untuk mereset password akun SmartBudget Assistant Anda yang terdaftar dengan email <strong>{to_email}</strong>.
+                          Kami menerima permintaan untuk mereset password akun SmartBudget Assistant Anda yang terdaftar dengan email <strong>$to_email</strong>.
                         </p>
                         <p style="margin: 0 0 20px 0; color: #374151; font-size: 15px; line-height: 1.6;">
                           Jika ini adalah Anda, silakan klik tombol di bawah untuk melanjutkan proses reset password. Jika bukan Anda yang meminta, abaikan email ini dengan aman.
@@ -431,7 +482,7 @@ def send_password_reset_email(
                         <table width="100%" cellpadding="0" cellspacing="0" style="margin: 35px 0;">
                           <tr>
                             <td align="center">
-                              <a href="{reset_url}" target="_blank" rel="noopener noreferrer" style="display: inline-block; background-color: #2563eb; background-image: linear-gradient(135deg, #2563eb 0%, #1e40af 100%); color: #ffffff !important; font-size: 16px; font-weight: 600; text-decoration: none !important; padding: 14px 32px; border-radius: 8px; box-shadow: 0 2px 4px rgba(37, 99, 235, 0.3); mso-line-height-rule: exactly;">
+                              <a href="$reset_url" target="_blank" rel="noopener noreferrer" style="display: inline-block; background-color: #2563eb; background-image: linear-gradient(135deg, #2563eb 0%, #1e40af 100%); color: #ffffff !important; font-size: 16px; font-weight: 600; text-decoration: none !important; padding: 14px 32px; border-radius: 8px; box-shadow: 0 2px 4px rgba(37, 99, 235, 0.3); mso-line-height-rule: exactly;">
                                 &#128274; Reset Password Sekarang
                               </a>
                             </td>
@@ -442,8 +493,8 @@ def send_password_reset_email(
                           Atau salin dan tempel tautan berikut ke browser Anda:
                         </p>
                         <div style="background-color: #f9fafb; border: 1px solid #e5e7eb; border-radius: 6px; padding: 12px 16px; word-break: break-all;">
-                          <a href="{reset_url}" target="_blank" rel="noopener noreferrer" style="color: #2563eb !important; font-size: 13px; text-decoration: underline;">
-                            {reset_url}
+                          <a href="$reset_url" target="_blank" rel="noopener noreferrer" style="color: #2563eb !important; font-size: 13px; text-decoration: underline;">
+                            $reset_url
                           </a>
                         </div>
                       </td>
@@ -482,19 +533,18 @@ def send_password_reset_email(
             </table>
           </body>
         </html>
-        """
+        """)
 
-    # Plain text alternative
-    text = f"""
+_RESET_TEXT_TMPL = Template("""
 SmartBudget Assistant - Reset Password
-{"=" * 50}
+==================================================
 
 Halo,
 
 Kami menerima permintaan untuk mereset password akun SmartBudget Assistant Anda.
 
 Klik tautan berikut untuk mereset password:
-{reset_url}
+$reset_url
 
 PENTING:
 ⚠️ Tautan ini akan kedaluwarsa dalam 1 jam
@@ -504,7 +554,17 @@ PENTING:
 ---
 Email otomatis - Jangan balas email ini
 © 2025 SmartBudget Assistant
-        """
+        """)
+
+
+def send_otp_email(to_email: str, otp_code: str, user_name: str) -> bool:
+    """Send OTP verification email. Returns True if sent, False if dev/no SMTP or error."""
+    greeting = f"Halo {user_name}," if user_name else "Halo,"
+    subject = "Kode Verifikasi Registrasi - SmartBudget Assistant"
+
+    html = _OTP_HTML_TMPL.substitute(greeting=greeting, otp_code=otp_code)
+
+    text = _OTP_TEXT_TMPL.substitute(greeting=greeting, otp_code=otp_code)
 
     # Try SendGrid first
     if send_email_sendgrid(to_email, subject, html, text):
@@ -512,16 +572,56 @@ Email otomatis - Jangan balas email ini
 
     # Fallback to SMTP if SendGrid not configured
     if not all([SMTP_HOST, SMTP_USER, SMTP_PASSWORD]):
-        print(
-            f"[EMAIL] Dev mode - No email provider configured. Host:{SMTP_HOST}, User:{SMTP_USER}"
-        )
+        logger.warning("email_provider_missing", kind="otp", to=to_email)
         return False
 
     try:
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
+        msg = MIMEMultipart("alternative")
+        msg["Subject"] = subject
+        msg["From"] = SMTP_FROM
+        msg["To"] = to_email
+        msg.attach(MIMEText(text, "plain"))
+        msg.attach(MIMEText(html, "html"))
+
+        with smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=5) as server:
+            server.starttls()
+            server.login(SMTP_USER, SMTP_PASSWORD)
+            server.sendmail(SMTP_FROM, to_email, msg.as_string())
 
+        logger.info("email_sent", via="smtp", kind="otp", to=to_email)
+        return True
+    except Exception as e:
+        logger.error("email_send_failed", exc=e, via="smtp", kind="otp", to=to_email)
+        return False
+
+
+def send_password_reset_email(
+    to_email: str, reset_token: str, user_name: str = None
+) -> bool:
+    """Send password reset email. Returns True if email was sent, False if dev mode."""
+
+    reset_url = f"{APP_URL}/reset-password.html?token={quote(reset_token, safe='')}"
+    greeting = f"Halo {user_name}," if user_name else "Halo,"
+    subject = "Reset Password - SmartBudget Assistant"
+
+    # HTML email body with professional design
+    html = _RESET_HTML_TMPL.substitute(
+        greeting=greeting, to_email=to_email, reset_url=reset_url
+    )
+
+    # Plain text alternative
+    text = _RESET_TEXT_TMPL.substitute(reset_url=reset_url)
+
+    # Try SendGrid first
+    if send_email_sendgrid(to_email, subject, html, text):
+        return True
+
+    # Fallback to SMTP if SendGrid not configured
+    if not all([SMTP_HOST, SMTP_USER, SMTP_PASSWORD]):
+        logger.warning("email_provider_missing", kind="reset", to=to_email)
+        return False
+
+    try:
         msg = MIMEMultipart("alternative")
         msg["Subject"] = subject
         msg["From"] = SMTP_FROM
@@ -538,14 +638,17 @@ Email otomatis - Jangan balas email ini
             server.login(SMTP_USER, SMTP_PASSWORD)
             server.sendmail(SMTP_FROM, to_email, msg.as_string())
 
-        print(f"[EMAIL] G�� Reset email sent via SMTP to {to_email}")
+        logger.info("email_sent", via="smtp", kind="reset", to=to_email)
         return True
     except Exception as e:
-        print(f"[EMAIL ERROR] Failed to send reset email: {e}")
+        logger.error("email_send_failed", exc=e, via="smtp", kind="reset", to=to_email)
         return False
 
 
 # --- Utilities ---
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
 def _normalize_date_iso(value):
     """Normalize natural-language date to ISO YYYY-MM-DD if possible.
     Returns ISO string or None if cannot parse.
@@ -553,9 +656,7 @@ def _normalize_date_iso(value):
     if not value:
         return None
     s = (value or "").strip()
-    import re as _re
-
-    if _re.match(r"^\d{4}-\d{2}-\d{2}$", s):
+    if _ISO_DATE_RE.match(s):
         return s
     try:
         import dateparser as _dp  # type: ignore
@@ -569,13 +670,16 @@ def _normalize_date_iso(value):
 
 
 def _wib_today_iso() -> str:
-    from datetime import datetime, timedelta, timezone
-
-    wib = timezone(timedelta(hours=7))
-    return datetime.now(wib).date().isoformat()
+    return datetime.now(_WIB).date().isoformat()
 
 
 # === SIMPLE FALLBACK INTENT PARSER ===
+_AMOUNT_JUTA_RE = re.compile(r"(\d+(?:[\.,]\d+)?)\s*(?:juta|jt)\b")
+_AMOUNT_RIBU_RE = re.compile(r"(\d+[\d\.,]*)\s*ribu")
+_AMOUNT_NUM_RE = re.compile(r"(\d{1,3}(?:[\.,]\d{3})+|\d{3,})")
+_AMOUNT_K_RE = re.compile(r"(\d+(?:\.\d+)?)\s*k\b")
+
+
 def parse_financial_intent(raw_text: str, today_str: str):
     """Very lightweight parser to extract an expense/income when LLM did not call a tool.
     Returns dict compatible with add_transaction tool or None.
@@ -598,7 +702,7 @@ def parse_financial_intent(raw_text: str, today_str: str):
     # Examples: 25,000 ; 25.000 ; 25000 ; 25 ribu ; 14 juta ; 14jt ; 30k
     amt = None
     # juta / jt pattern (e.g. 14jt, 14 juta, 2.5 juta)
-    m_juta = re.search(r"(\d+(%s:[\.,]\d+)%s)\s*(%s:juta|jt)\b", text)
+    m_juta = _AMOUNT_JUTA_RE.search(text)
     if m_juta:
         base = (
             m_juta.group(1).replace(".", ".").replace(",", ".")
@@ -609,7 +713,7 @@ def parse_financial_intent(raw_text: str, today_str: str):
             pass
     # ribu pattern
     if amt is None:
-        m_ribu = re.search(r"(\d+[\d\.,]*)\s*ribu", text)
+        m_ribu = _AMOUNT_RIBU_RE.search(text)
         if m_ribu:
             base = m_ribu.group(1).replace(".", "").replace(",", "")
             try:
@@ -618,7 +722,7 @@ def parse_financial_intent(raw_text: str, today_str: str):
                 pass
     # plain number with thousand separators
     if amt is None:
-        m_num = re.search(r"(\d{1,3}(%s:[\.,]\d{3})+|\d{3,})", text)
+        m_num = _AMOUNT_NUM_RE.search(text)
         if m_num:
             num_raw = m_num.group(1).replace(".", "").replace(",", "")
             try:
@@ -627,7 +731,7 @@ def parse_financial_intent(raw_text: str, today_str: str):
                 pass
     # short forms like 25k
     if amt is None:
-        m_k = re.search(r"(\d+(%s:\.\d+)%s)\s*k\b", text)
+        m_k = _AMOUNT_K_RE.search(text)
         if m_k:
             try:
                 amt = float(m_k.group(1)) * 1000
@@ -689,21 +793,151 @@ if GOOGLE_API_KEY and genai is not None:
     except Exception as e:
         print(f"Warning: Gemini configuration failed: {e}")
 
+GEMINI_SAFETY_SETTINGS = [
+    {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_SEXUALLY_EXPLICIT", "threshold": "BLOCK_NONE"},
+    {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
+]
+
+
+# Gemini has no tool calling here, so actions come back as a ```json``` block
+GEMINI_ACTION_HINT = """Jika perlu lakukan aksi kembalikan JSON dalam blok ```json``` dengan field 'action' dan 'data'.
+
+ATURAN KRITIS - WAJIB DIIKUTI:
+1. PEMASUKAN (income/record_income):
+   - 'amount' WAJIB
+   - 'category' WAJIB dan harus spesifik (Gaji, Bonus, Penjualan, Investasi - BUKAN "Lainnya")
+   - Jika kategori tidak disebutkan, TANYA DULU jangan langsung catat
+
+2. PENGELUARAN (expense/record_expense):
+   - 'amount' WAJIB
+   - 'category' WAJIB (Makan, Transport, Belanja, dll.)
+   - Jika tidak jelas, TANYA DULU
+
+3. TRANSFER (transfer_funds):
+   - 'amount' WAJIB
+   - 'from_account' WAJIB (akun sumber)
+   - 'to_account' WAJIB (akun tujuan)
+   - Jika ada yang kurang, TANYA DULU
+
+4. TARGET TABUNGAN (create_savings_goal):
+   - 'name' WAJIB (nama target)
+   - 'target_amount' WAJIB (jumlah target)
+   - Jika ada yang kurang, TANYA DULU
+
+5. TRANSFER KE TABUNGAN (transfer_to_savings):
+   - 'amount' WAJIB
+   - 'from_account' WAJIB
+   - 'goal_id' WAJIB (ID target tabungan)
+   - Jika ada yang kurang, TANYA DULU
+
+PRINSIP: JANGAN mencatat apapun ke database jika informasi tidak lengkap. TANYA dulu untuk klarifikasi.
+
+Action tersedia:
+- add_transaction / record_expense / record_income
+- update_transaction (wajib: id)
+- delete_transaction (wajib: id)
+- transfer_funds
+- create_savings_goal
+- update_savings_goal (wajib: id)
+- transfer_to_savings"""
+
+# Image types Gemini accepts as inline bytes; anything else goes through PIL
+GEMINI_INLINE_IMAGE_TYPES = frozenset(
+    {"image/jpeg", "image/png", "image/webp", "image/heic", "image/heif"}
+)
+
+# ```json {...}``` action block in a Gemini reply (non-greedy: first block only)
+_ACTION_BLOCK_RE = re.compile(r"```json\s*(.*?)\s*```", re.DOTALL)
+
+# Per-request user prompt, filled in with str.format
+USER_PROMPT_EN = "Today: {today}\nContext:\n{ctx}\n\nMemory:\n{mem_ctx}\n\nUser: {user_message}"
+USER_PROMPT_ID = "Tanggal: {today}\nKonteks:\n{ctx}\n\nMemori:\n{mem_ctx}\n\nUser: {user_message}"
+
+
+def _read_gemini_stream(chunks) -> str:
+    """Join a streamed Gemini reply, stopping as soon as a ```json``` block closes
+
+    The action can then run before generation finishes; pass an iterator and
+    read the rest (the model's explanation) with _drain_gemini_stream.
+    call_llm_with_retry only covers opening the stream: errors raised while
+    iterating it propagate to the caller without a retry. Raises ValueError when
+    no chunk carried text (e.g. the whole reply was blocked by safety filters).
+    """
+    text = ""
+    for chunk in chunks:
+        try:
+            text += chunk.text
+        except ValueError:
+            # Chunk without text parts (e.g. finish/safety metadata only)
+            continue
+        start = text.find("```json")
+        if start >= 0 and text.find("```", start + 7) >= 0:
+            break
+    if not text:
+        raise ValueError("Gemini returned no text (reply blocked or empty)")
+    return text
+
+
+def _drain_gemini_stream(chunks) -> str:
+    """Join the text left in a stream that _read_gemini_stream stopped early"""
+    text = ""
+    try:
+        for chunk in chunks:
+            try:
+                text += chunk.text
+            except ValueError:
+                continue
+    except Exception as e:
+        # The action already ran; answer without the explanation
+        logger.warning("gemini_stream_tail_failed", error=str(e))
+    return text
+
+
+@functools.lru_cache(maxsize=16)
+def _get_gemini_model(model_id: str):
+    """Reuse one GenerativeModel per model id instead of building it per request"""
+    return genai.GenerativeModel(model_id)
+
 
 # === STATIC ROUTES ===
+# Assets are not fingerprinted, so cache them briefly and let ETag/Last-Modified
+# revalidation (304) do the rest. HTML is always revalidated so deploys show up.
+PUBLIC_ASSET_MAX_AGE = 3600
+PUBLIC_DIR = str(BASE_DIR / "public")
+UPLOADS_DIR = str(BASE_DIR / "public" / "uploads")
+app.config["SEND_FILE_MAX_AGE_DEFAULT"] = PUBLIC_ASSET_MAX_AGE
+
+
+def _send_public_file(directory: str, filename: str):
+    max_age = 0 if filename.endswith(".html") else PUBLIC_ASSET_MAX_AGE
+    return send_from_directory(directory, filename, max_age=max_age, conditional=True)
+
+
 @app.route("/")
 def index():
-    return send_from_directory(str(BASE_DIR / "public"), "index.html")
+    return _send_public_file(PUBLIC_DIR, "index.html")
 
 
 @app.route("/<path:filename>")
 def serve_public(filename):
-    return send_from_directory(str(BASE_DIR / "public"), filename)
+    return _send_public_file(PUBLIC_DIR, filename)
 
 
 @app.route("/uploads/<path:filename>")
 def serve_uploads(filename):
-    return send_from_directory(str(BASE_DIR / "public" / "uploads"), filename)
+    if UPLOADS_ACCEL_PREFIX:
+        # Let nginx stream the bytes; Flask only validates the path
+        if safe_join(UPLOADS_DIR, filename) is None:
+            abort(404)
+        resp = Response(status=200)
+        # Percent-encode: the header must be latin-1, and nginx would read a raw
+        # "%" or "?" as an escape or the start of a query string
+        resp.headers["X-Accel-Redirect"] = f"{UPLOADS_ACCEL_PREFIX}/{quote(filename)}"
+        resp.headers.pop("Content-Type", None)
+        return resp
+    return _send_public_file(UPLOADS_DIR, filename)
 
 
 # === AUTH ROUTES ===
@@ -715,9 +949,7 @@ def register_send_otp():
     email = data.get("email", "").strip().lower()
     password = data.get("password", "")
 
-    print(
-        f"[DEBUG] Register OTP request - name: {name}, email: {email}, password len: {len(password) if password else 0}"
-    )
+    logger.debug("register_send_otp", email=email)
 
     # Skip reCAPTCHA verification for now (keys may be invalid)
     # TODO: Get valid reCAPTCHA v3 keys from https://www.google.com/recaptcha/admin
@@ -735,31 +967,42 @@ def register_send_otp():
     if len(password) < 6:
         return jsonify({"error": "Password must be at least 6 characters"}), 400
 
-    cur = db.execute("SELECT id FROM users WHERE email = %s", (email,))
+    # Hash in the background while the duplicate-email lookup round-trips to
+    # the DB. The email itself can only go out after the OTP row is committed,
+    # so a failed write never mails a code that cannot be verified.
+    hash_future = _executor.submit(hash_password, password)
+
+    cur = db.execute("SELECT 1 FROM users WHERE email = %s LIMIT 1", (email,))
     if cur.fetchone():
+        hash_future.cancel()
         return jsonify({"error": "Email already registered"}), 400
 
-    # Generate 6-digit OTP
-    otp_code = str(secrets.randbelow(1000000)).zfill(6)
+    # Generate 6-digit OTP (64 random bits keep the modulo bias negligible)
+    otp_code = f"{int.from_bytes(secrets.token_bytes(8), 'big') % 1_000_000:06d}"
 
     # Store OTP with user data (expires in 10 minutes)
-    wib = timezone(timedelta(hours=7))
-    expires_at = (datetime.now(wib) + timedelta(minutes=10)).strftime(
-        "%Y-%m-%d %H:%M:%S"
-    )
-    password_hash = generate_password_hash(password)
+    expires_at = (datetime.now(_WIB) + timedelta(minutes=10)).strftime(SQL_DT_FMT)
 
-    # Delete old OTPs for this email
-    db.execute("DELETE FROM registration_otps WHERE email = %s", (email,))
-
-    # Insert new OTP
-    db.execute(
-        "INSERT INTO registration_otps (email, otp_code, name, password_hash, expires_at) VALUES (%s, %s, %s, %s, %s)",
-        (email, otp_code, name, password_hash, expires_at),
-    )
-    db.commit()
+    try:
+        # Insert new OTP, replacing any previous one for this email
+        db.execute(
+            """INSERT INTO registration_otps (email, otp_code, name, password_hash, expires_at)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (email) DO UPDATE SET
+                otp_code = EXCLUDED.otp_code,
+                name = EXCLUDED.name,
+                password_hash = EXCLUDED.password_hash,
+                expires_at = EXCLUDED.expires_at,
+                created_at = CURRENT_TIMESTAMP""",
+            (email, otp_code, name, hash_future.result(), expires_at),
+        )
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error("register_otp_store_failed", exc=e)
+        return jsonify({"error": "Failed to create OTP, please try again"}), 500
 
-    # Send OTP email
+    # Send OTP email (no transaction is held open during the SMTP call)
     email_sent = send_otp_email(email, otp_code, name)
 
     resp = {"status": "ok", "message": "OTP sent to your email"}
@@ -778,7 +1021,7 @@ def register_verify_otp():
         email = data.get("email", "").strip().lower()
         otp_code = data.get("otp", "").strip()
 
-        print(f"[DEBUG] Verify OTP - email: {email}, otp: ***REDACTED***")
+        logger.debug("register_verify_otp", email=email)
 
         if not email or not otp_code:
             return jsonify({"error": "Email and OTP required"}), 400
@@ -791,28 +1034,25 @@ def register_verify_otp():
         otp_record = cur.fetchone()
 
         if not otp_record:
-            print(f"[DEBUG] No OTP record found for {email}")
+            logger.debug("register_otp_not_found", email=email)
             return jsonify({"error": "Invalid OTP code"}), 400
 
         # Check if OTP expired
-        wib = timezone(timedelta(hours=7))
-        now = datetime.now(wib)
+        now = datetime.now(_WIB)
 
         # Handle both string and datetime types from database
         expires_at = otp_record["expires_at"]
         if isinstance(expires_at, str):
-            expires_at = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
+            expires_at = _parse_sql_dt(expires_at)
 
         # Ensure timezone is set
         if expires_at.tzinfo is None:
-            expires_at = expires_at.replace(tzinfo=wib)
+            expires_at = expires_at.replace(tzinfo=_WIB)
 
         if now > expires_at:
-            db.execute("DELETE FROM registration_otps WHERE email = %s", (email,))
-            db.commit()
+            # Expired rows are purged by the background cleanup job
             return jsonify({"error": "OTP expired. Please request a new one"}), 400
 
-        print(f"[DEBUG] Creating user account for {email}")
         # Create user account with ocr_enabled = false by default
         db.execute(
             "INSERT INTO users (name, email, password_hash, role, ocr_enabled) VALUES (%s, %s, %s, %s, %s)",
@@ -823,14 +1063,16 @@ def register_verify_otp():
         db.execute("DELETE FROM registration_otps WHERE email = %s", (email,))
         db.commit()
 
-        print(f"[DEBUG] Registration successful for {email}")
+        _admin_users_cache.clear()
+        logger.info("register_completed", email=email)
         return jsonify({"status": "ok", "message": "Registration successful"}), 201
 
+    except UniqueViolation:
+        # Account was created after the OTP was sent (e.g. double submit)
+        db.rollback()
+        return jsonify({"error": "Email already registered"}), 400
     except Exception as e:
-        print(f"[ERROR] Verify OTP failed: {str(e)}")
-        import traceback
-
-        traceback.print_exc()
+        logger.error("register_verify_otp_failed", exc=e)
         return jsonify({"error": "Server error during verification"}), 500
 
 
@@ -856,31 +1098,36 @@ def login_api():
     if not email or not password:
         return jsonify({"error": get_message("email_password_required", lang)}), 400
 
-    cur = db.execute(
-        "SELECT id, name, email, password_hash, role FROM users WHERE email = %s",
-        (email,),
-    )
+    cur = db.execute_prepared("user_by_email", (email,))
     user = cur.fetchone()
 
     # Check if email exists
     if not user:
         return jsonify({"error": get_message("email_not_registered", lang)}), 404
 
-    # Check if password is correct
-    if not check_password_hash(user["password_hash"], password):
+    # Check if password is correct (repeated wrong guesses skip the KDF)
+    guess_key = _failed_login_key(email, password, user["password_hash"])
+    if guess_key in _failed_logins or not verify_password(
+        user["password_hash"], password
+    ):
+        _failed_logins.set(guess_key, True)
         return jsonify({"error": get_message("incorrect_password", lang)}), 401
 
-    token = secrets.token_urlsafe(32)
+    # Upgrade legacy/outdated hashes; hashing overlaps the session insert
+    rehash_future = None
+    if needs_rehash(user["password_hash"]):
+        rehash_future = _executor.submit(hash_password, password)
+
+    token = _new_token()
     # expiry (WIB): 30 days if remember, else 7 days
-    wib = timezone(timedelta(hours=7))
     days = 30 if remember else 7
-    expires_at = (datetime.now(wib) + timedelta(days=days)).strftime(
-        "%Y-%m-%d %H:%M:%S"
-    )
-    db.execute(
-        "INSERT INTO sessions (user_id, session_token, expires_at) VALUES (%s, %s, %s)",
-        (user["id"], token, expires_at),
-    )
+    expires_at = (datetime.now(_WIB) + timedelta(days=days)).strftime(SQL_DT_FMT)
+    db.execute_prepared("insert_session", (user["id"], token, expires_at))
+    if rehash_future is not None:
+        db.execute(
+            "UPDATE users SET password_hash = %s WHERE id = %s",
+            (rehash_future.result(), user["id"]),
+        )
     db.commit()
 
     return jsonify(
@@ -901,15 +1148,33 @@ def login_api():
 @require_login
 def logout_api():
     db = get_db()
-    token = request.headers.get("X-Session-Token") or request.cookies.get(
-        "session_token"
-    )
+    token = get_request_token()
     if token:
         db.execute("DELETE FROM sessions WHERE session_token = %s", (token,))
         db.commit()
+        invalidate_session(token)
     return jsonify({"status": "ok"}), 200
 
 
+# Removes a user and every row that references it, children first, as a single
+# multi-statement batch (one DB round-trip)
+DELETE_USER_SQL = """
+    DELETE FROM llm_log_embeddings WHERE user_id = %(user_id)s;
+    DELETE FROM llm_logs WHERE user_id = %(user_id)s;
+    DELETE FROM conversation_state WHERE user_id = %(user_id)s;
+    DELETE FROM chat_sessions WHERE user_id = %(user_id)s;
+    DELETE FROM llm_memory_summary WHERE user_id = %(user_id)s;
+    DELETE FROM llm_memory_config WHERE user_id = %(user_id)s;
+    DELETE FROM transactions WHERE user_id = %(user_id)s;
+    DELETE FROM user_account_balances WHERE user_id = %(user_id)s;
+    DELETE FROM savings_goals WHERE user_id = %(user_id)s;
+    DELETE FROM goals WHERE user_id = %(user_id)s;
+    DELETE FROM password_resets WHERE user_id = %(user_id)s;
+    DELETE FROM sessions WHERE user_id = %(user_id)s;
+    DELETE FROM users WHERE id = %(user_id)s;
+"""
+
+
 @app.route("/api/account/delete", methods=["POST"])
 @require_login
 def delete_account_api():
@@ -926,28 +1191,22 @@ def delete_account_api():
     # Verify password
     cur = db.execute("SELECT password_hash FROM users WHERE id = %s", (user_id,))
     row = cur.fetchone()
-    if not row or not check_password_hash(row["password_hash"], password):
+    if not row or not verify_password(row["password_hash"], password):
         return jsonify({"error": get_message("incorrect_password", lang)}), 401
 
     try:
-        # Delete all user data (cascade will handle related tables if FK constraints exist)
-        # Manual deletion for safety
-        db.execute("DELETE FROM llm_logs WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM chat_summaries WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM chat_log_embeddings WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM transactions WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM savings_goals WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM password_resets WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
-        db.execute("DELETE FROM users WHERE id = %s", (user_id,))
+        # Delete all user data in one round-trip
+        db.execute(DELETE_USER_SQL, {"user_id": user_id})
         db.commit()
+        invalidate_user_sessions(user_id)
+        _admin_users_cache.clear()
 
         return jsonify(
             {"status": "ok", "message": get_message("account_deleted", lang)}
         ), 200
     except Exception as e:
         db.rollback()
-        print(f"[ERROR] Failed to delete account for user {user_id}: {e}")
+        logger.error("account_delete_failed", exc=e, user_id=user_id)
         return jsonify({"error": get_message("delete_account_failed", lang)}), 500
 
 
@@ -971,16 +1230,17 @@ def password_forgot_api():
 
     user_id = row["id"]
     user_name = row["name"]
-    token = secrets.token_urlsafe(32)
-    wib = timezone(timedelta(hours=7))
-    expires_at = (datetime.now(wib) + timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    token = _new_token()
+    expires_at = (datetime.now(_WIB) + timedelta(hours=1)).strftime(SQL_DT_FMT)
 
     try:
-        # Remove any existing tokens for this user
-        db.execute("DELETE FROM password_resets WHERE user_id = %s", (user_id,))
-        # Insert new token
+        # One token per user: replace any existing one in a single statement
         db.execute(
-            "INSERT INTO password_resets (user_id, token, expires_at) VALUES (%s, %s, %s)",
+            """INSERT INTO password_resets (user_id, token, expires_at) VALUES (%s, %s, %s)
+            ON CONFLICT (user_id) DO UPDATE SET
+                token = EXCLUDED.token,
+                expires_at = EXCLUDED.expires_at,
+                created_at = CURRENT_TIMESTAMP""",
             (user_id, token, expires_at),
         )
         db.commit()
@@ -989,22 +1249,26 @@ def password_forgot_api():
         # Return server error on DB failure
         return jsonify({"error": "Failed to process reset request"}), 500
 
-    # Try to send email
-    email_sent = send_password_reset_email(email, token, user_name)
-
-    # Only return success if email was actually sent
-    if email_sent:
+    # Send in the background so the SMTP/SendGrid round-trip stays off the
+    # request; an undelivered link is logged once the send finishes
+    if email_provider_configured():
+        future = _email_executor.submit(
+            send_password_reset_email, email, token, user_name
+        )
+        future.add_done_callback(
+            functools.partial(_log_undelivered_email, kind="reset", user_id=user_id)
+        )
         response_data = {
             "status": "ok",
             "message": get_message("reset_link_sent", lang),
         }
         return jsonify(response_data), 200
 
-    # If email not sent (dev mode or email error), include reset URL for testing
+    # No email provider (dev mode): include reset URL for testing
     response_data = {
         "status": "ok",
         "message": "Reset link created. Check server logs for the link (dev mode).",
-        "reset_url": f"/reset-password.html%stoken={token}",
+        "reset_url": f"/reset-password.html?token={quote(token, safe='')}",
         "dev_mode": True,
     }
     return jsonify(response_data), 200
@@ -1020,10 +1284,11 @@ def verify_reset_token_api():
     if not token:
         return jsonify({"error": "Token is required"}), 400
 
+    # Session timezone is WIB, so LOCALTIMESTAMP matches the stored expires_at
     cur = db.execute(
-        """SELECT pr.expires_at, u.email 
-           FROM password_resets pr 
-           JOIN users u ON pr.user_id = u.id 
+        """SELECT u.email, pr.expires_at < LOCALTIMESTAMP AS expired
+           FROM password_resets pr
+           JOIN users u ON pr.user_id = u.id
            WHERE pr.token = %s""",
         (token,),
     )
@@ -1034,23 +1299,7 @@ def verify_reset_token_api():
             {"error": get_message("invalid_token", lang), "valid": False}
         ), 404
 
-    # Check expiry
-    expires_at = row["expires_at"]
-    try:
-        if isinstance(expires_at, datetime):
-            exp_dt = expires_at
-        else:
-            try:
-                exp_dt = datetime.fromisoformat(expires_at.replace("Z", ""))
-            except ValueError:
-                exp_dt = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return jsonify(
-            {"error": get_message("invalid_token", lang), "valid": False}
-        ), 400
-
-    wib_now = datetime.now(timezone(timedelta(hours=7))).replace(tzinfo=None)
-    if exp_dt < wib_now:
+    if row["expired"]:
         return jsonify(
             {"error": get_message("token_expired", lang), "valid": False}
         ), 400
@@ -1059,6 +1308,7 @@ def verify_reset_token_api():
 
 
 @app.route("/api/password/reset", methods=["POST"])
+@limiter.limit("10 per hour")  # Each valid attempt costs a full Argon2 hash
 def password_reset_api():
     db = get_db()
     data = request.get_json() or {}
@@ -1071,43 +1321,27 @@ def password_reset_api():
     if len(new_password) < 6:
         return jsonify({"error": get_message("password_min_length", lang)}), 400
 
-    cur = db.execute(
-        "SELECT user_id, expires_at FROM password_resets WHERE token = %s",
+    # Cheap token lookup first so unknown or expired tokens never reach the KDF
+    row = db.execute(
+        "SELECT expires_at < LOCALTIMESTAMP AS expired FROM password_resets WHERE token = %s",
         (token,),
-    )
-    row = cur.fetchone()
+    ).fetchone()
     if not row:
         return jsonify({"error": get_message("invalid_token", lang)}), 400
-
-    # Expiry check
-    expires_at = row["expires_at"]
-    try:
-        if isinstance(expires_at, datetime):
-            exp_dt = expires_at
-        else:
-            try:
-                exp_dt = datetime.fromisoformat(expires_at.replace("Z", ""))
-            except ValueError:
-                exp_dt = datetime.strptime(expires_at, "%Y-%m-%d %H:%M:%S")
-    except Exception:
-        return jsonify({"error": get_message("invalid_token", lang)}), 400
-
-    wib_now = datetime.now(timezone(timedelta(hours=7))).replace(tzinfo=None)
-    if exp_dt < wib_now:
-        # Remove expired token
-        db.execute("DELETE FROM password_resets WHERE token = %s", (token,))
-        db.commit()
+    if row["expired"]:
         return jsonify({"error": get_message("token_expired", lang)}), 400
 
-    # Update password and cleanup tokens for this user
-    user_id = row["user_id"]
+    # Token re-check, password update and token cleanup in one round-trip
     try:
-        password_hash = generate_password_hash(new_password)
-        db.execute(
-            "UPDATE users SET password_hash = %s WHERE id = %s",
-            (password_hash, user_id),
-        )
-        db.execute("DELETE FROM password_resets WHERE user_id = %s", (user_id,))
+        password_hash = hash_password(new_password)
+        row = db.execute_prepared("reset_password", (token, password_hash)).fetchone()
+        if not row:
+            db.rollback()
+            return jsonify({"error": get_message("invalid_token", lang)}), 400
+        if row["expired"]:
+            # Expired tokens are purged by the background cleanup job
+            db.rollback()
+            return jsonify({"error": get_message("token_expired", lang)}), 400
         db.commit()
         return jsonify(
             {"status": "ok", "message": get_message("password_reset_success", lang)}
@@ -1125,10 +1359,7 @@ def password_reset_api():
 def me_api():
     user = g.user
     db = get_db()
-    cur = db.execute(
-        "SELECT name, email, avatar_url, phone, bio, role, ocr_enabled, ai_provider, ai_model FROM users WHERE id = %s",
-        (user["id"],),
-    )
+    cur = db.execute_prepared("user_profile", (user["id"],))
     user_data = cur.fetchone()
     if not user_data:
         return jsonify({"error": "User not found"}), 404
@@ -1165,33 +1396,22 @@ def update_profile_api():
         return jsonify({"error": "Nama tidak boleh kosong"}), 400
 
     try:
-        # Build the UPDATE query dynamically based on provided fields
-        update_fields = ["name = %s", "phone = %s", "bio = %s"]
-        values = [name, phone, bio]
-
-        if ocr_enabled is not None:
-            update_fields.append("ocr_enabled = %s")
-            values.append(bool(ocr_enabled))
-
-        if ai_provider is not None:
-            update_fields.append("ai_provider = %s")
-            values.append(ai_provider)
-
-        if ai_model is not None:
-            update_fields.append("ai_model = %s")
-            values.append(ai_model)
-
-        values.append(user_id)
-
-        query = f"UPDATE users SET {', '.join(update_fields)} WHERE id = %s"
-        db.execute(query, values)
+        # One fixed statement; fields left out of the request stay unchanged
+        updated_user = db.execute_prepared(
+            "update_profile",
+            (
+                name,
+                phone,
+                bio,
+                None if ocr_enabled is None else bool(ocr_enabled),
+                ai_provider,
+                ai_model,
+                user_id,
+            ),
+        ).fetchone()
         db.commit()
-
-        cur = db.execute(
-            "SELECT name, email, avatar_url, phone, bio, ocr_enabled, ai_provider, ai_model FROM users WHERE id = %s",
-            (user_id,),
-        )
-        updated_user = cur.fetchone()
+        invalidate_user_sessions(user_id)
+        _admin_users_cache.clear()
 
         return jsonify(
             {
@@ -1231,11 +1451,11 @@ def update_password_api():
     if current_password:
         cur = db.execute("SELECT password_hash FROM users WHERE id = %s", (user_id,))
         user = cur.fetchone()
-        if not user or not check_password_hash(user["password_hash"], current_password):
+        if not user or not verify_password(user["password_hash"], current_password):
             return jsonify({"error": "Password saat ini salah"}), 403
 
     try:
-        password_hash = generate_password_hash(new_password)
+        password_hash = hash_password(new_password)
         db.execute(
             "UPDATE users SET password_hash = %s WHERE id = %s",
             (password_hash, user_id),
@@ -1254,20 +1474,13 @@ def admin_users_api():
     db = get_db()
 
     if request.method == "GET":
-        cur = db.execute(
-            "SELECT id, name, email, role, created_at, ocr_enabled FROM users ORDER BY created_at DESC"
-        )
-        rows = [
-            {
-                "id": r["id"],
-                "name": r["name"],
-                "email": r["email"],
-                "role": r["role"],
-                "created_at": r["created_at"],
-                "ocr_enabled": bool(r.get("ocr_enabled", False)),
-            }
-            for r in cur.fetchall()
-        ]
+        rows = _admin_users_cache.get("users")
+        if rows is None:
+            cur = db.execute(
+                "SELECT id, name, email, role, created_at, COALESCE(ocr_enabled, FALSE) AS ocr_enabled FROM users ORDER BY created_at DESC"
+            )
+            rows = cur.fetchall()
+            _admin_users_cache.set("users", rows)
         return jsonify(rows), 200
 
     elif request.method == "POST":
@@ -1284,12 +1497,8 @@ def admin_users_api():
         if role not in ["admin", "user"]:
             return jsonify({"error": "Invalid role"}), 400
 
-        cur = db.execute("SELECT id FROM users WHERE email = %s", (email,))
-        if cur.fetchone():
-            return jsonify({"error": "Email already registered"}), 400
-
         try:
-            password_hash = generate_password_hash(password)
+            password_hash = hash_password(password)
             # Admin gets OCR enabled by default, users get false
             ocr_enabled = True if role == "admin" else False
             db.execute(
@@ -1297,9 +1506,14 @@ def admin_users_api():
                 (name, email, password_hash, role, ocr_enabled),
             )
             db.commit()
+            _admin_users_cache.clear()
             return jsonify(
                 {"status": "ok", "message": "User created successfully"}
             ), 201
+        except UniqueViolation:
+            # users.email is UNIQUE, so the INSERT doubles as the existence check
+            db.rollback()
+            return jsonify({"error": "Email already registered"}), 400
         except Exception as e:
             db.rollback()
             return jsonify({"error": f"Failed to create user: {str(e)}"}), 500
@@ -1324,34 +1538,28 @@ def admin_user_detail_api(user_id):
             return jsonify({"error": "Invalid role"}), 400
 
         try:
+            password_hash = None
             if password:
                 if len(password) < 6:
                     return jsonify(
                         {"error": "Password must be at least 6 characters"}
                     ), 400
-                password_hash = generate_password_hash(password)
-                if ocr_enabled is not None:
-                    db.execute(
-                        "UPDATE users SET name = %s, email = %s, role = %s, password_hash = %s, ocr_enabled = %s WHERE id = %s",
-                        (name, email, role, password_hash, bool(ocr_enabled), user_id),
-                    )
-                else:
-                    db.execute(
-                        "UPDATE users SET name = %s, email = %s, role = %s, password_hash = %s WHERE id = %s",
-                        (name, email, role, password_hash, user_id),
-                    )
-            else:
-                if ocr_enabled is not None:
-                    db.execute(
-                        "UPDATE users SET name = %s, email = %s, role = %s, ocr_enabled = %s WHERE id = %s",
-                        (name, email, role, bool(ocr_enabled), user_id),
-                    )
-                else:
-                    db.execute(
-                        "UPDATE users SET name = %s, email = %s, role = %s WHERE id = %s",
-                        (name, email, role, user_id),
-                    )
+                password_hash = hash_password(password)
+            # NULL password_hash/ocr_enabled keeps the stored value
+            db.execute(
+                "UPDATE users SET name = %s, email = %s, role = %s, password_hash = COALESCE(%s, password_hash), ocr_enabled = COALESCE(%s, ocr_enabled) WHERE id = %s",
+                (
+                    name,
+                    email,
+                    role,
+                    password_hash,
+                    None if ocr_enabled is None else bool(ocr_enabled),
+                    user_id,
+                ),
+            )
             db.commit()
+            invalidate_user_sessions(user_id)
+            _admin_users_cache.clear()
             return jsonify(
                 {"status": "ok", "message": "User updated successfully"}
             ), 200
@@ -1361,11 +1569,10 @@ def admin_user_detail_api(user_id):
 
     elif request.method == "DELETE":
         try:
-            db.execute("DELETE FROM sessions WHERE user_id = %s", (user_id,))
-            db.execute("DELETE FROM transactions WHERE user_id = %s", (user_id,))
-            db.execute("DELETE FROM savings_goals WHERE user_id = %s", (user_id,))
-            db.execute("DELETE FROM users WHERE id = %s", (user_id,))
+            db.execute(DELETE_USER_SQL, {"user_id": user_id})
             db.commit()
+            invalidate_user_sessions(user_id)
+            _admin_users_cache.clear()
             return jsonify(
                 {"status": "ok", "message": "User deleted successfully"}
             ), 200
@@ -1375,6 +1582,13 @@ def admin_user_detail_api(user_id):
 
 
 # === TRANSACTION ROUTES ===
+
+# GET /api/transactions: max page size for ?limit=, and rows per fetch when
+# streaming an unpaginated listing
+TX_PAGE_MAX = 1000
+TX_STREAM_CHUNK = 500
+
+
 @app.route("/api/transactions", methods=["GET", "POST"])
 @require_login
 def transactions_api():
@@ -1447,30 +1661,24 @@ def transactions_api():
                 }
             ), 400
 
-        # De-dupe guard for rapid duplicate submissions
-        dup_id = _dedupe_recent_transaction(
-            db, user_id, date_str, tx_type, category, amount, account
-        )
-        if dup_id:
-            logger.info(
-                "transaction_dedup_hit",
-                user_id=user_id,
-                date=date_str,
-                type=tx_type,
-                category=category,
-                amount=amount,
-                account=account,
-                duplicate_id=dup_id,
-            )
-            return jsonify({"status": "ok", "duplicate": True, "id": dup_id}), 200
-
         try:
-            db.execute(
-                """INSERT INTO transactions (user_id, date, type, category, description, amount, account)
-                VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+            # De-dupe guard for rapid duplicate submissions runs in the INSERT
+            row = db.execute_prepared(
+                "insert_transaction",
                 (user_id, date_str, tx_type, category, description, amount, account),
-            )
+            ).fetchone()
             db.commit()
+            if row is None:
+                logger.info(
+                    "transaction_dedup_hit",
+                    user_id=user_id,
+                    date=date_str,
+                    type=tx_type,
+                    category=category,
+                    amount=amount,
+                    account=account,
+                )
+                return jsonify({"status": "ok", "duplicate": True}), 200
             logger.info(
                 "transaction_recorded",
                 user_id=user_id,
@@ -1480,7 +1688,7 @@ def transactions_api():
                 account=account,
                 date=date_str,
             )
-            return jsonify({"status": "ok"})
+            return jsonify({"status": "ok", "id": row["id"]})
         except Exception as e:
             db.rollback()
             logger.error(
@@ -1514,27 +1722,65 @@ def transactions_api():
         where.append("category = %s")
         params.append(request.args.get("category"))
     if request.args.get("q"):
-        where.append("description LIKE %s")
+        # Case-insensitive substring match, served by the pg_trgm GIN index
+        where.append("description ILIKE %s")
         params.append(f"%{request.args.get('q')}%")
 
+    # Keyset pagination: pass the last row's date and id to get the next page
+    before_date = request.args.get("before_date")
+    before_id = request.args.get("before_id")
+    if bool(before_date) != bool(before_id):
+        return jsonify({"error": "before_date dan before_id harus diisi bersamaan"}), 400
+    if before_date and before_id:
+        try:
+            before_date = date.fromisoformat(before_date)
+        except ValueError:
+            return jsonify({"error": "before_date harus berformat YYYY-MM-DD"}), 400
+        try:
+            params.extend([before_date, int(before_id)])
+        except ValueError:
+            return jsonify({"error": "before_id harus berupa angka"}), 400
+        where.append("(date, id) < (%s, %s)")
+
+    limit = None
+    if request.args.get("limit"):
+        try:
+            limit = min(max(int(request.args["limit"]), 1), TX_PAGE_MAX)
+        except ValueError:
+            return jsonify({"error": "limit harus berupa angka"}), 400
+
     sql = f"""SELECT id, date, type, category, description, amount, account, created_at
         FROM transactions WHERE {" AND ".join(where)} ORDER BY date DESC, id DESC"""
 
-    cur = db.execute(sql, params)
-    rows = [
-        {
-            "id": r["id"],
-            "date": r["date"],
-            "type": r["type"],
-            "category": r["category"],
-            "description": r["description"],
-            "amount": r["amount"],
-            "account": r["account"],
-            "created_at": r["created_at"],
-        }
-        for r in cur.fetchall()
-    ]
-    return jsonify(rows)
+    if limit is not None:
+        cur = db.execute(f"{sql} LIMIT %s", params + [limit])
+        return jsonify([dict(r) for r in cur.fetchall()])
+
+    # Full history (the web UI paginates client-side): fetch it in chunks from a
+    # server-side cursor and write each chunk out before fetching the next, so
+    # the whole result is never held in memory
+    cur = db.cursor(name="tx_export")
+    cur.execute(sql, params)
+    return Response(
+        stream_with_context(_stream_json_rows(cur, TX_STREAM_CHUNK)),
+        mimetype="application/json",
+    )
+
+
+def _stream_json_rows(cur, chunk_size: int):
+    """Yield the cursor's rows as one JSON array, chunk_size rows at a time"""
+    try:
+        yield "["
+        sep = ""
+        while True:
+            rows = cur.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield sep + ",".join(app.json.dumps(dict(r)) for r in rows)
+            sep = ","
+        yield "]"
+    finally:
+        cur.close()
 
 
 @app.route("/api/transactions/<int:tx_id>", methods=["PUT", "DELETE"])
@@ -1592,36 +1838,52 @@ def summary_api():
     return jsonify(summary)
 
 
+# Accounts shown on the dashboard, in display order
+ACCOUNTS_LIST = [
+    "Cash",
+    "BCA",
+    "Maybank",
+    "Seabank",
+    "Shopeepay",
+    "Gopay",
+    "Jago",
+    "ISaku",
+    "Ovo",
+    "Superbank",
+    "Blu Account (Saving)",
+]
+
+
+def _num(v):
+    """Coerce a NUMERIC/None aggregate to float (0 when missing)"""
+    if v is None:
+        return 0
+    try:
+        return float(v)
+    except Exception:
+        return 0
+
+
 @app.route("/api/balance", methods=["GET"])
 @require_login
 def balance_api():
     user_id = g.user["id"]
     db = get_db()
     account_filter = request.args.get("account")
-    where_clause = "user_id = %s AND type IN ('income', 'expense')"
+    where_clause = "user_id = %s"
     params = [user_id]
 
     if account_filter:
         where_clause += " AND account = %s"
         params.append(account_filter)
 
+    # Income minus expense, kept per account by the transactions trigger
     cur = db.execute(
-        f"""SELECT SUM(CASE WHEN type = 'income' THEN amount
-                           WHEN type = 'expense' THEN -amount
-                           ELSE 0 END) AS balance
-        FROM transactions WHERE {where_clause}""",
+        f"SELECT SUM(balance) AS balance FROM user_account_balances WHERE {where_clause}",
         params,
     )
     row = cur.fetchone()
 
-    def _num(v):
-        if v is None:
-            return 0
-        try:
-            return float(v)
-        except Exception:
-            return 0
-
     return jsonify({"balance": _num(row["balance"] if row else None)})
 
 
@@ -1630,41 +1892,19 @@ def balance_api():
 def accounts_api():
     user_id = g.user["id"]
     db = get_db()
-    accounts_list = [
-        "Cash",
-        "BCA",
-        "Maybank",
-        "Seabank",
-        "Shopeepay",
-        "Gopay",
-        "Jago",
-        "ISaku",
-        "Ovo",
-        "Superbank",
-        "Blu Account (Saving)",
-    ]
+
+    # All per-account balances (incl. transfers) in one query against the
+    # trigger-maintained snapshot
+    cur = db.execute(
+        "SELECT account, balance + transfers AS balance FROM user_account_balances WHERE user_id = %s AND account = ANY(%s)",
+        (user_id, ACCOUNTS_LIST),
+    )
+    balances = {r["account"]: r["balance"] for r in cur.fetchall()}
 
     accounts = []
     total_all = 0.0
-    for acc in accounts_list:
-        cur = db.execute(
-            """SELECT SUM(CASE WHEN type = 'income' THEN amount
-                               WHEN type = 'expense' THEN -amount
-                               ELSE amount END) AS balance
-            FROM transactions WHERE user_id = %s AND account = %s""",
-            (user_id, acc),
-        )
-        row = cur.fetchone()
-
-        def _num(v):
-            if v is None:
-                return 0
-            try:
-                return float(v)
-            except Exception:
-                return 0
-
-        balance = _num(row["balance"] if row else None)
+    for acc in ACCOUNTS_LIST:
+        balance = _num(balances.get(acc))
         accounts.append({"account": acc, "balance": balance})
         total_all += balance
 
@@ -1675,7 +1915,6 @@ def accounts_api():
 @require_login
 def transfer_api():
     user_id = g.user["id"]
-    db = get_db()
     data = request.get_json() or {}
 
     amount = float(data.get("amount") or 0)
@@ -1732,10 +1971,12 @@ def transfer_api():
             }
         ), 400
 
+    db = get_db()
     try:
+        # Both legs in one statement (and one transaction)
         db.execute(
             """INSERT INTO transactions (user_id, date, type, category, description, amount, account)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+            VALUES (%s, %s, %s, %s, %s, %s, %s), (%s, %s, %s, %s, %s, %s, %s)""",
             (
                 user_id,
                 date_str,
@@ -1744,12 +1985,6 @@ def transfer_api():
                 description,
                 -amount,
                 from_account,
-            ),
-        )
-        db.execute(
-            """INSERT INTO transactions (user_id, date, type, category, description, amount, account)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)""",
-            (
                 user_id,
                 date_str,
                 "transfer",
@@ -1792,32 +2027,17 @@ def transfer_api():
 @require_login
 def savings_api():
     user_id = g.user["id"]
-    db = get_db()
 
     if request.method == "GET":
-        cur = db.execute(
-            """SELECT id, name, target_amount, current_amount, description, target_date
+        cur = get_db().execute(
+            """SELECT id, name, target_amount, current_amount, description, target_date,
+                ROUND(CASE WHEN target_amount > 0
+                           THEN current_amount * 100.0 / target_amount
+                           ELSE 0 END, 1) AS progress_pct
             FROM savings_goals WHERE user_id = %s ORDER BY created_at DESC""",
             (user_id,),
         )
-        rows = [
-            {
-                "id": r["id"],
-                "name": r["name"],
-                "target_amount": r["target_amount"],
-                "current_amount": r["current_amount"],
-                "description": r["description"],
-                "target_date": r["target_date"],
-                "progress_pct": round(
-                    (r["current_amount"] / r["target_amount"] * 100)
-                    if r["target_amount"] > 0
-                    else 0,
-                    1,
-                ),
-            }
-            for r in cur.fetchall()
-        ]
-        return jsonify(rows)
+        return jsonify(cur.fetchall())
 
     elif request.method == "POST":
         data = request.get_json() or {}
@@ -1830,6 +2050,7 @@ def savings_api():
         if target_amount <= 0:
             return jsonify({"error": "target_amount harus > 0"}), 400
 
+        db = get_db()
         db.execute(
             """INSERT INTO savings_goals (user_id, name, target_amount, current_amount, description, target_date)
             VALUES (%s, %s, %s, %s, %s, %s)""",
@@ -1845,27 +2066,21 @@ def savings_api():
         if not goal_id:
             return jsonify({"error": "id harus disediakan"}), 400
 
-        cur = db.execute(
-            "SELECT id FROM savings_goals WHERE id = %s AND user_id = %s",
-            (goal_id, user_id),
-        )
-        if not cur.fetchone():
-            return jsonify({"error": "Target tabungan tidak ditemukan"}), 404
-
-        updates = []
-        params = []
-
-        if "name" in data and data["name"]:
-            updates.append("name = %s")
-            params.append(data["name"])
+        # None = keep the stored value; description/target_date may be cleared,
+        # so they carry an explicit "was sent" flag instead
+        # Text columns: coerce so a JSON number can't break the COALESCE/CASE types
+        name = str(data["name"]) if data.get("name") else None
+        target_amount = None
         if "target_amount" in data and float(data.get("target_amount", 0)) > 0:
-            updates.append("target_amount = %s")
-            params.append(float(data["target_amount"]))
-        if "description" in data:
-            updates.append("description = %s")
-            params.append(data["description"])
-        if "target_date" in data:
-            td = (data.get("target_date") or "").strip()
+            target_amount = float(data["target_amount"])
+        set_description = "description" in data
+        description = data.get("description")
+        if description is not None:
+            description = str(description)
+        set_target_date = "target_date" in data
+        td = None
+        if set_target_date:
+            td = str(data.get("target_date") or "").strip()
             if td:
                 nd = _normalize_date_iso(td)
                 if not nd:
@@ -1877,10 +2092,13 @@ def savings_api():
                         }
                     ), 400
                 td = nd
-            updates.append("target_date = %s")
-            params.append(td or None)
 
-        if not updates:
+        if (
+            name is None
+            and target_amount is None
+            and not set_description
+            and not set_target_date
+        ):
             return jsonify(
                 {
                     "success": False,
@@ -1889,9 +2107,29 @@ def savings_api():
                 }
             )
 
-        params.extend([goal_id, user_id])
-        sql = f"UPDATE savings_goals SET {', '.join(updates)} WHERE id = %s AND user_id = %s"
-        db.execute(sql, params)
+        # Fixed statement text; rowcount doubles as the existence check
+        db = get_db()
+        cur = db.execute(
+            """UPDATE savings_goals SET
+                name = COALESCE(%s, name),
+                target_amount = COALESCE(%s, target_amount),
+                description = CASE WHEN %s THEN %s ELSE description END,
+                target_date = CASE WHEN %s THEN %s ELSE target_date END
+            WHERE id = %s AND user_id = %s""",
+            (
+                name,
+                target_amount,
+                set_description,
+                description,
+                set_target_date,
+                td or None,
+                goal_id,
+                user_id,
+            ),
+        )
+        if cur.rowcount == 0:
+            db.rollback()
+            return jsonify({"error": "Target tabungan tidak ditemukan"}), 404
         db.commit()
         return jsonify({"status": "ok", "message": "Target tabungan berhasil diupdate"})
 
@@ -1902,6 +2140,7 @@ def savings_api():
         if not goal_id:
             return jsonify({"error": "id harus disediakan"}), 400
 
+        db = get_db()
         db.execute(
             "DELETE FROM savings_goals WHERE id = %s AND user_id = %s",
             (goal_id, user_id),
@@ -1914,7 +2153,6 @@ def savings_api():
 @require_login
 def transfer_to_savings_api():
     user_id = g.user["id"]
-    db = get_db()
     data = request.get_json() or {}
 
     amount = float(data.get("amount") or 0)
@@ -1960,36 +2198,33 @@ def transfer_to_savings_api():
             }
         ), 400
 
+    db = get_db()
     try:
-        db.execute("BEGIN")
-
-        goal_cur = db.execute(
-            "SELECT name, current_amount FROM savings_goals WHERE id = %s AND user_id = %s",
-            (goal_id, user_id),
-        )
-        goal = goal_cur.fetchone()
-        if not goal:
-            return jsonify({"error": "Target tabungan tidak ditemukan"}), 404
-
-        db.execute(
-            """INSERT INTO transactions (user_id, date, type, category, description, amount, account)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)""",
+        # Increment the goal under its row lock and record the expense in one
+        # statement; no row back means the goal does not exist for this user
+        cur = db.execute(
+            """WITH goal AS (
+                UPDATE savings_goals SET current_amount = current_amount + %s
+                WHERE id = %s AND user_id = %s
+                RETURNING name
+            )
+            INSERT INTO transactions (user_id, date, type, category, description, amount, account)
+            SELECT %s, %s::date, 'expense', 'Tabungan', 'Menabung untuk: ' || goal.name, %s, %s
+            FROM goal
+            RETURNING id""",
             (
+                amount,
+                goal_id,
+                user_id,
                 user_id,
                 date_str,
-                "expense",
-                "Tabungan",
-                f"Menabung untuk: {goal['name']}",
                 amount,
                 from_account,
             ),
         )
-
-        new_amount = float(goal["current_amount"]) + float(amount)
-        db.execute(
-            "UPDATE savings_goals SET current_amount = %s WHERE id = %s",
-            (new_amount, goal_id),
-        )
+        if cur.fetchone() is None:
+            db.rollback()
+            return jsonify({"error": "Target tabungan tidak ditemukan"}), 404
 
         db.commit()
         return jsonify(
@@ -2001,28 +2236,73 @@ def transfer_to_savings_api():
 
 
 # === LLM CHAT ROUTE ===
+# LLM tool names that start a multi-turn state machine intent
+_TOOL_INTENTS = {
+    "add_transaction": "add_transaction",
+    "edit_transaction": "edit_transaction",
+    "delete_transaction": "delete_transaction",
+    "transfer_funds": "transfer",
+    "create_savings_goal": "create_goal",
+}
+
+# Tool arguments copied into the conversation state (tool param -> state field)
+_STATE_FIELD_PARAMS = {
+    "amount": "amount",
+    "category": "category",
+    "account": "account",
+    "from_account": "from_account",
+    "to_account": "to_account",
+    "field_name": "field_name",
+    "new_value": "new_value",
+    "transaction_id": "transaction_id",
+    "password": "password",
+    "name": "name",
+    "target_amount": "target_amount",
+    "deadline": "deadline",
+    "confirm": "confirm",
+}
+
+# Tool result messages that mean "ask the user for more details"
+_CLARIFICATION_MESSAGES = frozenset(
+    {
+        "need_category",
+        "need_type",
+        "need_amount",
+        "need_account",
+        "need_name",
+        "need_goal",
+        "need_date",
+        "no_updates",
+    }
+)
+
 @app.route("/api/chat", methods=["POST"])
 @require_login
 @limiter.limit("20 per hour")  # 20 messages per hour per IP
 def chat_api():
     user_id = g.user["id"]
+    db = get_db()
     # Use WIB date for prompts
-    today = datetime.now(timezone(timedelta(hours=7))).date()
+    today = datetime.now(_WIB).date()
 
     # Handle both JSON and multipart form data (for image uploads)
     image_file = None
-    image_data = None
+    image_bytes = None
+    image_mime = None  # Upload's declared type, kept only when it is a known image type
     data = {}  # Initialize data dict for both cases
 
     if request.content_type and "multipart/form-data" in request.content_type:
         # Image upload
-        user_message = (request.form.get("message") or "").strip()
-        lang = request.form.get("lang", "id")
-        provider = request.form.get("model_provider", "google")
-        model_id = request.form.get("model") or None
+        form = request.form
+        user_message = (form.get("message") or "").strip()
+        lang = form.get("lang", "id")
+        provider = form.get("model_provider", "google")
+        model_id = form.get("model") or None
+        year_val = form.get("year")
+        month_val = form.get("month")
 
         # Get session_id from form if present
-        session_id_str = request.form.get("session_id")
+        session_id_str = form.get("session_id")
         if session_id_str:
             try:
                 data["session_id"] = int(session_id_str)
@@ -2032,13 +2312,12 @@ def chat_api():
         if "image" in request.files:
             image_file = request.files["image"]
             if image_file and image_file.filename:
-                # Read image data
-                import base64
-
+                # Keep the raw bytes; only the OpenAI path needs base64
                 image_bytes = image_file.read()
-                image_data = base64.b64encode(image_bytes).decode("utf-8")
-                # Reset file pointer if needed
-                image_file.seek(0)
+                # The declared type is client-controlled (browsers send
+                # application/octet-stream for unknown extensions)
+                if image_file.mimetype in GEMINI_INLINE_IMAGE_TYPES:
+                    image_mime = image_file.mimetype
     else:
         # Regular JSON request
         data = request.get_json() or {}
@@ -2046,25 +2325,22 @@ def chat_api():
         lang = data.get("lang", "id")
         provider = data.get("model_provider", "google")
         model_id = data.get("model") or None
+        year_val = data.get("year")
+        month_val = data.get("month")
 
-    print(f"\n{'=' * 60}")
-    print("[DEBUG] === CHAT API ENDPOINT DIPANGGIL ===")
-    print(f"[DEBUG] User ID: {user_id}")
-    print(f"[DEBUG] User Message: {user_message}")
-    print(f"[DEBUG] Has Image: {image_data is not None}")
-    print(f"{'=' * 60}\n")
+    logger.debug(
+        "chat_request",
+        user_id=user_id,
+        message_len=len(user_message),
+        has_image=image_bytes is not None,
+    )
 
-    if not user_message and not image_data:
+    if not user_message and not image_bytes:
         return jsonify({"error": "message atau gambar harus diisi"}), 400
 
-    # Check if user has OCR enabled when image is uploaded
-    if image_data:
-        db = get_db()
-        user_row = db.execute(
-            "SELECT ocr_enabled FROM users WHERE id = %s", (user_id,)
-        ).fetchone()
-
-        if not user_row or not user_row.get("ocr_enabled"):
+    # Check if user has OCR enabled when image is uploaded (loaded with the session)
+    if image_bytes:
+        if not g.user.get("ocr_enabled"):
             return jsonify(
                 {
                     "error": "Fitur upload gambar belum diaktifkan. Silakan aktifkan OCR di pengaturan profil Anda terlebih dahulu.",
@@ -2073,17 +2349,6 @@ def chat_api():
             ), 403
 
     # Parse year and month safely
-    year_val = None
-    month_val = None
-
-    if request.content_type and "multipart/form-data" in request.content_type:
-        year_val = request.form.get("year")
-        month_val = request.form.get("month")
-    else:
-        data = request.get_json() or {}
-        year_val = data.get("year")
-        month_val = data.get("month")
-
     year = int(year_val) if year_val else today.year
     month = int(month_val) if month_val else today.month
     provider = provider or "google"
@@ -2095,48 +2360,41 @@ def chat_api():
         else:
             model_id = "gemini-2.5-flash"
 
-    print(f"[DEBUG] Provider: {provider}")
-    print(f"[DEBUG] Model: {model_id}")
-    print(f"[DEBUG] Language: {lang}")
-    print(f"[DEBUG] Year/Month: {year}/{month}\n")
+    logger.debug(
+        "chat_context",
+        provider=provider,
+        model=model_id,
+        lang=lang,
+        year=year,
+        month=month,
+    )
 
     # Get or create session
     session_id = data.get("session_id")
     if not session_id:
         # Create new session
-        db = get_db()
-        db.execute(
-            "INSERT INTO chat_sessions (user_id, title) VALUES (%s, %s)",
+        session_id = db.execute(
+            "INSERT INTO chat_sessions (user_id, title) VALUES (%s, %s) RETURNING id",
             (user_id, "New Chat"),
-        )
+        ).fetchone()["id"]
         db.commit()
-        cur = db.execute(
-            "SELECT id FROM chat_sessions WHERE user_id = %s ORDER BY created_at DESC LIMIT 1",
-            (user_id,),
-        )
-        row = cur.fetchone()
-        session_id = row["id"] if row else None
 
-    # Log user message with session
+    # Log user message with session; flushed so the memory context includes it
     log_message(user_id, "user", user_message, session_id=session_id)
+    flush_logs()
 
     ctx = build_financial_context(user_id, year, month)
     mem_ctx = build_memory_context(user_id)
-    db = get_db()
-    row = db.execute("SELECT name FROM users WHERE id = %s", (user_id,)).fetchone()
-    user_name = row["name"] if row else "Teman"
+    user_name = g.user.get("name") or "Teman"
 
-    wib = timezone(timedelta(hours=7))
-    time_str = datetime.now(wib).strftime("%H:%M WIB, %A, %d %B %Y")
+    time_str = datetime.now(_WIB).strftime("%H:%M WIB, %A, %d %B %Y")
 
     # Detect intent and use appropriate prompt to save tokens
     intent = detect_intent(user_message)
     base_prompt = get_system_prompt(intent, lang, user_name, time_str)
 
-    user_prompt = (
-        f"Today: {today.isoformat()}\nContext:\n{ctx}\n\nMemory:\n{mem_ctx}\n\nUser: {user_message}"
-        if lang == "en"
-        else f"Tanggal: {today.isoformat()}\nKonteks:\n{ctx}\n\nMemori:\n{mem_ctx}\n\nUser: {user_message}"
+    user_prompt = (USER_PROMPT_EN if lang == "en" else USER_PROMPT_ID).format(
+        today=today.isoformat(), ctx=ctx, mem_ctx=mem_ctx, user_message=user_message
     )
 
     # === CONVERSATION STATE MANAGEMENT ===
@@ -2151,9 +2409,12 @@ def chat_api():
         partial_data = state_data.get("partial_data", {})
         next_prompt = state_data.get("next_prompt", "")
 
-        print("[DEBUG] Active Conversation State Detected!")
-        print(f"[DEBUG] Intent: {intent}, State: {state}")
-        print(f"[DEBUG] Partial Data: {partial_data}\n")
+        logger.debug(
+            "chat_active_state",
+            intent=intent,
+            state=state,
+            partial_fields=list(partial_data),
+        )
 
         # Add state context to prompt to help LLM understand multi-turn flow
         if lang == "en":
@@ -2169,12 +2430,15 @@ def chat_api():
     if provider == "openai":
         try:
             # Build user message with image if provided
-            if image_data:
+            if image_bytes:
+                image_b64 = base64.b64encode(image_bytes).decode("ascii")
                 user_content = [
                     {"type": "text", "text": user_prompt},
                     {
                         "type": "image_url",
-                        "image_url": {"url": f"data:image/jpeg;base64,{image_data}"},
+                        "image_url": {
+                            "url": f"data:{image_mime or 'image/jpeg'};base64,{image_b64}"
+                        },
                     },
                 ]
             else:
@@ -2206,47 +2470,37 @@ def chat_api():
             msg = resp.choices[0].message
 
             if msg.tool_calls:
-                print(f"\n{'=' * 60}")
-                print("[DEBUG] LLM memanggil TOOL(s)!")
-                print(f"[DEBUG] Jumlah tool calls: {len(msg.tool_calls)}")
-                print(f"{'=' * 60}\n")
+                logger.debug("chat_tool_calls", count=len(msg.tool_calls))
 
                 results = []
 
                 # === MAP TOOL CALLS TO INTENTS FOR STATE MANAGEMENT ===
-                # Map LLM tool names to state machine intents
-                intent_map = {
-                    "add_transaction": "add_transaction",
-                    "edit_transaction": "edit_transaction",
-                    "delete_transaction": "delete_transaction",
-                    "transfer_funds": "transfer",
-                    "create_savings_goal": "create_goal",
-                }
-
                 # Detect intent from first tool call (usually only 1 per turn in multi-turn flows)
                 first_tool_name = msg.tool_calls[0].function.name
-                detected_intent = intent_map.get(first_tool_name)
+                detected_intent = _TOOL_INTENTS.get(first_tool_name)
 
                 if detected_intent:
-                    print(f"[DEBUG] Detected Intent for State Mgmt: {detected_intent}")
+                    logger.debug("chat_intent_detected", intent=detected_intent)
                     # Check if we need to initialize state (only if no active state)
                     if not active_state or not active_state.get("success"):
                         success, init_result = ConversationStateManager.init_state(
                             user_id, session_id, detected_intent
                         )
                         if success:
-                            print(f"[DEBUG] State initialized: {init_result}")
+                            logger.debug("chat_state_initialized", result=init_result)
 
                 # === END INTENT DETECTION ===
 
                 for tc in msg.tool_calls:
                     fn_name = tc.function.name
-                    fn_args = json.loads(tc.function.arguments)
+                    fn_args = json_loads(tc.function.arguments)
 
-                    print(f"\n{'=' * 60}")
-                    print(f"[DEBUG] Tool Call: {fn_name}")
-                    print(f"[DEBUG] Arguments: {sanitize_for_logging(fn_args)}")
-                    print(f"{'=' * 60}\n")
+                    if logger.is_debug():
+                        logger.debug(
+                            "chat_tool_call",
+                            tool=fn_name,
+                            arguments=sanitize_for_logging(fn_args),
+                        )
 
                     # Validate LLM arguments before execution
                     is_valid, validation_result = validate_action_arguments(
@@ -2275,108 +2529,67 @@ def chat_api():
 
                     results.append(result)
 
-                    print(f"\n{'=' * 60}")
-                    print(f"[DEBUG] Tool Result: {result}")
-                    print(f"{'=' * 60}\n")
+                    logger.debug(
+                        "chat_tool_result",
+                        tool=fn_name,
+                        success=result.get("success"),
+                    )
 
                     # === UPDATE CONVERSATION STATE IF APPLICABLE ===
                     if detected_intent and result.get("success"):
-                        # Extract field values from fn_args to update state
-                        # Map tool parameters to state manager field names
-                        param_to_field_map = {
-                            "amount": "amount",
-                            "category": "category",
-                            "account": "account",
-                            "from_account": "from_account",
-                            "to_account": "to_account",
-                            "field_name": "field_name",
-                            "new_value": "new_value",
-                            "transaction_id": "transaction_id",
-                            "password": "password",
-                            "name": "name",
-                            "target_amount": "target_amount",
-                            "deadline": "deadline",
-                            "confirm": "confirm",
+                        # Extract field values from fn_args and update state in one write
+                        extracted = {
+                            state_field: fn_args[param_key]
+                            for param_key, state_field in _STATE_FIELD_PARAMS.items()
+                            if param_key in fn_args
                         }
-
-                        # Update state with each extracted field
-                        for param_key, state_field in param_to_field_map.items():
-                            if param_key in fn_args:
-                                value = fn_args[param_key]
-                                success, update_result = (
-                                    ConversationStateManager.update_field(
-                                        session_id, state_field, value
-                                    )
+                        if extracted:
+                            success, update_result = (
+                                ConversationStateManager.update_fields(
+                                    session_id, extracted
+                                )
+                            )
+                            if success:
+                                logger.debug(
+                                    "chat_state_updated", fields=list(extracted)
                                 )
-                                if success:
-                                    print(
-                                        f"[DEBUG] State updated: {state_field}={value}"
-                                    )
 
                     # === END STATE UPDATE ===
 
-                summary = "\n".join(
-                    [
+                # Single pass: status lines, first ask_user prompt, clarification, failure
+                summary_parts = []
+                ask_user_msg = None
+                needs_clarification = False
+                has_failure = False
+                for r in results:
+                    summary_parts.append(
                         ("✓" if r["success"] else "✗") + " " + r["message"]
-                        for r in results
-                    ]
-                )
-                # If any tool signals clarification, ask user immediately
-                clarification_types = [
-                    "need_category",
-                    "need_type",
-                    "need_amount",
-                    "need_account",
-                    "need_name",
-                    "need_goal",
-                    "need_date",
-                    "no_updates",
-                ]
-                any_ask = next(
-                    (
-                        r.get("ask_user")
-                        for r in results
-                        if (not r["success"]) and r.get("ask_user")
-                    ),
-                    None,
-                )
-                if any_ask:
-                    log_message(
-                        user_id,
-                        "assistant",
-                        any_ask,
-                        {"awaiting_clarification": True},
-                        session_id=session_id,
-                    )
-                    return jsonify({"answer": any_ask, "session_id": session_id}), 200
-                needs_clarification = any(
-                    (not r["success"]) and (r.get("message") in clarification_types)
-                    for r in results
-                )
-                if needs_clarification:
-                    clarification_msg = next(
-                        (
-                            r.get("ask_user")
-                            for r in results
-                            if r.get("message") in clarification_types
-                        ),
-                        "Mohon lengkapi informasi yang diperlukan.",
                     )
+                    if r["success"]:
+                        continue
+                    has_failure = True
+                    if ask_user_msg is None and r.get("ask_user"):
+                        ask_user_msg = r["ask_user"]
+                    if r.get("message") in _CLARIFICATION_MESSAGES:
+                        needs_clarification = True
+                summary = "\n".join(summary_parts)
+
+                # If any tool signals clarification, ask user immediately
+                if ask_user_msg or needs_clarification:
+                    answer = ask_user_msg or "Mohon lengkapi informasi yang diperlukan."
                     log_message(
                         user_id,
                         "assistant",
-                        clarification_msg,
+                        answer,
                         {"awaiting_clarification": True},
                         session_id=session_id,
                     )
-                    return jsonify(
-                        {"answer": clarification_msg, "session_id": session_id}
-                    ), 200
+                    return jsonify({"answer": answer, "session_id": session_id}), 200
 
                 # If any failure without ask_user, return only summary to avoid mixed messages
-                if any(not r["success"] for r in results):
+                if has_failure:
                     log_message(user_id, "assistant", summary, session_id=session_id)
-                    maybe_update_summary(user_id)
+                    schedule_summary_update(user_id)
                     return jsonify({"answer": summary, "session_id": session_id}), 200
 
                 # All successful - ask LLM to explain results naturally without status lines
@@ -2397,7 +2610,7 @@ def chat_api():
                 # For truly successful actions, show status once then explain
                 answer = summary + "\n\n" + explanation if explanation else summary
                 log_message(user_id, "assistant", answer, session_id=session_id)
-                maybe_update_summary(user_id)
+                schedule_summary_update(user_id)
                 return jsonify({"answer": answer, "session_id": session_id}), 200
 
             # Fallback: no tool calls
@@ -2405,7 +2618,7 @@ def chat_api():
             # Biarkan LLM handle dengan response text biasa
             answer = msg.content
             log_message(user_id, "assistant", answer, session_id=session_id)
-            maybe_update_summary(user_id)
+            schedule_summary_update(user_id)
             return jsonify({"answer": answer, "session_id": session_id}), 200
 
         except Exception as e:
@@ -2414,79 +2627,28 @@ def chat_api():
     # PROVIDER: GEMINI
     if provider == "google":
         try:
-            # Initialize Gemini model dynamically with selected model_id
-            current_gemini_model = genai.GenerativeModel(model_id)
-
-            safety = [
-                {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
-                {"category": "HARM_CATEGORY_HATE_SPEECH", "threshold": "BLOCK_NONE"},
-                {
-                    "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                    "threshold": "BLOCK_NONE",
-                },
-                {
-                    "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                    "threshold": "BLOCK_NONE",
-                },
-            ]
-            hint = """Jika perlu lakukan aksi kembalikan JSON dalam blok ```json``` dengan field 'action' dan 'data'.
-
-ATURAN KRITIS - WAJIB DIIKUTI:
-1. PEMASUKAN (income/record_income):
-   - 'amount' WAJIB
-   - 'category' WAJIB dan harus spesifik (Gaji, Bonus, Penjualan, Investasi - BUKAN "Lainnya")
-   - Jika kategori tidak disebutkan, TANYA DULU jangan langsung catat
-
-2. PENGELUARAN (expense/record_expense):
-   - 'amount' WAJIB
-   - 'category' WAJIB (Makan, Transport, Belanja, dll.)
-   - Jika tidak jelas, TANYA DULU
-
-3. TRANSFER (transfer_funds):
-   - 'amount' WAJIB
-   - 'from_account' WAJIB (akun sumber)
-   - 'to_account' WAJIB (akun tujuan)
-   - Jika ada yang kurang, TANYA DULU
-
-4. TARGET TABUNGAN (create_savings_goal):
-   - 'name' WAJIB (nama target)
-   - 'target_amount' WAJIB (jumlah target)
-   - Jika ada yang kurang, TANYA DULU
-
-5. TRANSFER KE TABUNGAN (transfer_to_savings):
-   - 'amount' WAJIB
-   - 'from_account' WAJIB
-   - 'goal_id' WAJIB (ID target tabungan)
-   - Jika ada yang kurang, TANYA DULU
-
-PRINSIP: JANGAN mencatat apapun ke database jika informasi tidak lengkap. TANYA dulu untuk klarifikasi.
-
-Action tersedia:
-- add_transaction / record_expense / record_income
-- update_transaction (wajib: id)
-- delete_transaction (wajib: id)
-- transfer_funds
-- create_savings_goal
-- update_savings_goal (wajib: id)
-- transfer_to_savings"""
-            prompt = f"{base_prompt}\n\n{user_prompt}\n\n{hint}"
+            current_gemini_model = _get_gemini_model(model_id)
+            # Static rules before the per-turn context/memory, so consecutive
+            # turns share the longest possible prompt prefix
+            prompt = f"{base_prompt}\n\n{GEMINI_ACTION_HINT}\n\n{user_prompt}"
 
             # Build content with image if provided
-            if image_data:
-                import PIL.Image
-                import io
-                import base64
+            if image_bytes:
+                if image_mime:
+                    # Send the upload as-is instead of decoding it with PIL
+                    # only for the SDK to re-encode it
+                    image = {"mime_type": image_mime, "data": image_bytes}
+                else:
+                    import PIL.Image
 
-                # Decode base64 image
-                image_bytes = base64.b64decode(image_data)
-                image = PIL.Image.open(io.BytesIO(image_bytes))
+                    image = PIL.Image.open(io.BytesIO(image_bytes))
 
                 # For Gemini vision with retry
                 resp = call_llm_with_retry(
                     current_gemini_model.generate_content,
                     [prompt, image],
-                    safety_settings=safety,
-                    stream=False,
+                    safety_settings=GEMINI_SAFETY_SETTINGS,
+                    stream=True,
                     max_retries=3,
                     initial_delay=1.0,
                 )
@@ -2494,8 +2656,8 @@ Action tersedia:
                 resp = call_llm_with_retry(
                     current_gemini_model.generate_content,
                     prompt,
-                    safety_settings=safety,
-                    stream=False,
+                    safety_settings=GEMINI_SAFETY_SETTINGS,
+                    stream=True,
                     max_retries=3,
                     initial_delay=1.0,
                 )
@@ -2509,26 +2671,25 @@ Action tersedia:
                 )
                 return jsonify({"reply": error_msg, "session_id": session_id}), 503
 
-            text = resp.text
+            chunks = iter(resp)
+            text = _read_gemini_stream(chunks)
 
-            # Fixed regex to properly extract JSON from code block
-            jm = re.search(r"```json\s*(.*?)\s*```", text, re.DOTALL)
+            # Most replies are plain answers; skip the regex when there is no fence
+            jm = _ACTION_BLOCK_RE.search(text) if "```json" in text else None
             if jm:
                 try:
                     json_str = jm.group(1).strip()
-                    print(f"\n{'=' * 60}")
-                    print("[DEBUG] GEMINI: JSON action block ditemukan!")
-                    print(f"[DEBUG] JSON content: {json_str}")
-                    print(f"{'=' * 60}\n")
 
-                    obj = json.loads(json_str)
+                    obj = json_loads(json_str)
                     action = obj.get("action")
                     data_obj = obj.get("data", {})
 
-                    print(f"\n{'=' * 60}")
-                    print(f"[DEBUG] GEMINI Tool Call: {action}")
-                    print(f"[DEBUG] GEMINI Arguments: {sanitize_for_logging(data_obj)}")
-                    print(f"{'=' * 60}\n")
+                    if logger.is_debug():
+                        logger.debug(
+                            "gemini_tool_call",
+                            action=action,
+                            arguments=sanitize_for_logging(data_obj),
+                        )
 
                     # Validate LLM arguments before execution
                     is_valid, validation_result = validate_action_arguments(
@@ -2552,22 +2713,15 @@ Action tersedia:
                             user_id, action, validation_result, lang=lang
                         )
 
-                    print(f"\n{'=' * 60}")
-                    print(f"[DEBUG] GEMINI Tool Result: {res}")
-                    print(f"{'=' * 60}\n")
+                    logger.debug(
+                        "gemini_tool_result", action=action, success=res.get("success")
+                    )
 
                     # Handle special case: need clarification (category, type, amount, account, name, goal, etc.)
-                    clarification_types = [
-                        "need_category",
-                        "need_type",
-                        "need_amount",
-                        "need_account",
-                        "need_name",
-                        "need_goal",
-                        "need_date",
-                        "no_updates",
-                    ]
-                    if not res["success"] and res.get("message") in clarification_types:
+                    if (
+                        not res["success"]
+                        and res.get("message") in _CLARIFICATION_MESSAGES
+                    ):
                         answer = res.get(
                             "ask_user", "Mohon lengkapi informasi yang diperlukan."
                         )
@@ -2607,7 +2761,10 @@ Action tersedia:
                         ), 200
 
                     # Success: Let LLM explain naturally without forcing status prefix
-                    # Extract just the explanation part without JSON
+                    # Extract just the explanation part without JSON (the text
+                    # after the block is still streaming)
+                    text += _drain_gemini_stream(chunks)
+                    remaining = text.replace(jm.group(0), "").strip()
                     explanation = (
                         remaining
                         if remaining
@@ -2622,17 +2779,17 @@ Action tersedia:
                     ]:
                         answer += "\n\n" + explanation
                     log_message(user_id, "assistant", answer, session_id=session_id)
-                    maybe_update_summary(user_id)
+                    schedule_summary_update(user_id)
                     return jsonify({"answer": answer, "session_id": session_id}), 200
                 except Exception as je:
-                    print(f"[DEBUG] Gemini JSON parse error: {je}")
+                    logger.warning("gemini_action_parse_failed", error=str(je))
 
             # Fallback: no JSON action block found
             # DISABLED auto-parse untuk mencegah double recording
             # Biarkan Gemini handle dengan response text biasa
             answer = text
             log_message(user_id, "assistant", answer, session_id=session_id)
-            maybe_update_summary(user_id)
+            schedule_summary_update(user_id)
             return jsonify({"answer": answer, "session_id": session_id}), 200
 
         except Exception as ge:
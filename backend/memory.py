@@ -1,21 +1,49 @@
 """Long-term memory utilities for LLM interactions"""
 
 from __future__ import annotations
-import json
+import functools
 from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 
+from flask import g, has_request_context
 from openai import OpenAI
+from core import TTLCache, json_dumps
 from database import get_db
+from services import enqueue_log
 
 # Default constants (can be overridden per user via llm_memory_config)
 SUMMARY_THRESHOLD = 12  # regenerate summary after this many new interactions
 MAX_LOG_CONTEXT = 8  # number of recent messages to include in live context
 MAX_LOG_SOURCE = 200  # number of logs to pull when regenerating summary
 
+# Log content is clipped in SQL so long replies are not sent over the wire
+CONTEXT_SNIPPET_CHARS = 200  # per message in the live memory context
+SUMMARY_SNIPPET_CHARS = 500  # per message in the summarization source
+_CLIPPED_CONTENT = (
+    "CASE WHEN length(content) > ? THEN LEFT(content, ?) || '...' ELSE content END"
+)
+
+
+# Overrides only change through /api/memory/config; every worker keeps its own
+# copy, so another worker may serve a stale config for up to the TTL
+_config_cache = TTLCache(maxsize=1024, ttl=300)
+
 
 def get_effective_config(user_id: int) -> Dict[str, int]:
-    """Fetch per-user memory config overrides or return defaults."""
+    """Fetch per-user memory config overrides or return defaults (cached)."""
+    cfg = _config_cache.get(user_id)
+    if cfg is None:
+        cfg = _load_effective_config(user_id)
+        _config_cache.set(user_id, cfg)
+    return dict(cfg)
+
+
+def invalidate_config_cache(user_id: int) -> None:
+    """Drop the cached config after the user's overrides change."""
+    _config_cache.pop(user_id)
+
+
+def _load_effective_config(user_id: int) -> Dict[str, int]:
     db = get_db()
     cur = db.execute(
         "SELECT summary_threshold, max_log_context, max_source FROM llm_memory_config WHERE user_id = ?",
@@ -38,7 +66,11 @@ def get_effective_config(user_id: int) -> Dict[str, int]:
 OPENAI_TIMEOUT_SEC = 10
 OPENAI_MAX_RETRIES = 2
 
-client = OpenAI()
+
+@functools.lru_cache(maxsize=1)
+def _client() -> OpenAI:
+    """Created on first summary, then reused (keeps its HTTP connection pool)"""
+    return OpenAI()
 
 
 def log_message(
@@ -48,45 +80,53 @@ def log_message(
     meta: Optional[dict] = None,
     session_id: Optional[int] = None,
 ) -> None:
-    """Persist a single message into llm_logs"""
-    db = get_db()
-    db.execute(
-        "INSERT INTO llm_logs (user_id, session_id, role, content, meta_json) VALUES (?, ?, ?, ?, ?)",
-        (user_id, session_id, role, content, json.dumps(meta) if meta else None),
-    )
-    db.commit()
+    """Queue a single message for llm_logs (written in batches by the log writer)
+
+    Within a request the row is committed before the response goes out (see the
+    after_request flush in main.py), so other workers see it on the next request.
+    """
+    enqueue_log(user_id, session_id, role, content, json_dumps(meta) if meta else None)
+    if has_request_context():
+        g.llm_logs_pending = True
 
 
 def get_recent_dialogue(
-    user_id: int, limit: Optional[int] = None, session_id: Optional[int] = None
+    user_id: int,
+    limit: Optional[int] = None,
+    session_id: Optional[int] = None,
+    max_chars: Optional[int] = None,
 ) -> List[Dict]:
     db = get_db()
     if limit is None:
         cfg = get_effective_config(user_id)
         limit = cfg["max_log_context"]
 
+    content = "content"
+    params = []
+    if max_chars is not None:
+        content = _CLIPPED_CONTENT
+        params += [max_chars, max_chars]
+
     where = "user_id = ?"
-    params = [user_id]
+    params.append(user_id)
     if session_id is not None:
         where += " AND session_id = ?"
         params.append(session_id)
 
     cur = db.execute(
-        f"SELECT role, content, created_at FROM llm_logs WHERE {where} ORDER BY id DESC LIMIT ?",
+        f"SELECT role, {content} AS content, created_at FROM llm_logs WHERE {where} ORDER BY id DESC LIMIT ?",
         params + [limit],
     )
+    # Rows are already dicts with exactly these keys; reverse to chronological
     rows = cur.fetchall()
-    # reverse to chronological
-    return [
-        {"role": r["role"], "content": r["content"], "created_at": r["created_at"]}
-        for r in reversed(rows)
-    ]
+    rows.reverse()
+    return rows
 
 
 def get_memory_summary(user_id: int) -> Optional[Dict]:
     db = get_db()
     cur = db.execute(
-        "SELECT summary_text, interaction_count, updated_at FROM llm_memory_summary WHERE user_id = ?",
+        "SELECT summary_text, interaction_count, last_seen_log_id, updated_at FROM llm_memory_summary WHERE user_id = ?",
         (user_id,),
     )
     row = cur.fetchone()
@@ -95,6 +135,7 @@ def get_memory_summary(user_id: int) -> Optional[Dict]:
     return {
         "summary_text": row["summary_text"],
         "interaction_count": row["interaction_count"],
+        "last_seen_log_id": row["last_seen_log_id"],
         "updated_at": row["updated_at"],
     }
 
@@ -105,28 +146,42 @@ def maybe_update_summary(user_id: int) -> Optional[Dict]:
     cfg = get_effective_config(user_id)
     current = get_memory_summary(user_id)
 
-    cur = db.execute("SELECT COUNT(*) AS c FROM llm_logs WHERE user_id = ?", (user_id,))
-    total_logs = cur.fetchone()["c"] or 0
-
     last_count = current["interaction_count"] if current else 0
-    if current and total_logs - last_count < cfg["summary_threshold"]:
+    last_seen = current["last_seen_log_id"] if current else None
+    if last_seen is None:
+        # No high-water mark yet (first summary or one written before it existed)
+        cur = db.execute(
+            "SELECT COUNT(*) AS c FROM llm_logs WHERE user_id = ?", (user_id,)
+        )
+        new_logs = (cur.fetchone()["c"] or 0) - last_count
+    else:
+        # Only count logs after the last summarized one (range scan on user_id, id)
+        cur = db.execute(
+            "SELECT COUNT(*) AS c FROM llm_logs WHERE user_id = ? AND id > ?",
+            (user_id, last_seen),
+        )
+        new_logs = cur.fetchone()["c"] or 0
+
+    if current and new_logs < cfg["summary_threshold"]:
         return current
+    total_logs = last_count + new_logs
 
+    # Postgres assembles the chronological "U:/A:" transcript in one row
     cur = db.execute(
-        "SELECT role, content FROM llm_logs WHERE user_id = ? ORDER BY id DESC LIMIT ?",
-        (user_id, cfg["max_source"]),
+        f"""SELECT MAX(id) AS last_id,
+                string_agg(
+                    CASE WHEN role = 'user' THEN 'U: ' ELSE 'A: ' END || content,
+                    E'\\n' ORDER BY id
+                ) AS convo
+            FROM (
+                SELECT id, role, {_CLIPPED_CONTENT} AS content FROM llm_logs
+                WHERE user_id = ? ORDER BY id DESC LIMIT ?
+            ) recent""",
+        (SUMMARY_SNIPPET_CHARS, SUMMARY_SNIPPET_CHARS, user_id, cfg["max_source"]),
     )
-    rows = cur.fetchall()
-    # Build plain text conversation
-    convo_lines = []
-    for r in reversed(rows):  # chronological
-        tag = "U:" if r["role"] == "user" else "A:"
-        # truncate very long lines
-        content = r["content"]
-        if len(content) > 500:
-            content = content[:500] + "..."
-        convo_lines.append(f"{tag} {content}")
-    convo_text = "\n".join(convo_lines)
+    row = cur.fetchone()
+    last_log_id = row["last_id"] if row["last_id"] is not None else last_seen
+    convo_text = row["convo"] or ""
 
     # Summarization prompt (Indonesian focus)
     system_prompt = (
@@ -138,7 +193,7 @@ def maybe_update_summary(user_id: int) -> Optional[Dict]:
     last_error = None
     for attempt in range(OPENAI_MAX_RETRIES + 1):
         try:
-            resp = client.chat.completions.create(
+            resp = _client().chat.completions.create(
                 model="gpt-4o-mini",
                 messages=[
                     {"role": "system", "content": system_prompt},
@@ -158,13 +213,13 @@ def maybe_update_summary(user_id: int) -> Optional[Dict]:
     # Upsert summary
     if current:
         db.execute(
-            "UPDATE llm_memory_summary SET summary_text = ?, interaction_count = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?",
-            (summary_text, total_logs, user_id),
+            "UPDATE llm_memory_summary SET summary_text = ?, interaction_count = ?, last_seen_log_id = ?, updated_at = CURRENT_TIMESTAMP WHERE user_id = ?",
+            (summary_text, total_logs, last_log_id, user_id),
         )
     else:
         db.execute(
-            "INSERT INTO llm_memory_summary (user_id, summary_text, interaction_count) VALUES (?, ?, ?)",
-            (user_id, summary_text, total_logs),
+            "INSERT INTO llm_memory_summary (user_id, summary_text, interaction_count, last_seen_log_id) VALUES (?, ?, ?, ?)",
+            (user_id, summary_text, total_logs, last_log_id),
         )
     db.commit()
 
@@ -172,6 +227,7 @@ def maybe_update_summary(user_id: int) -> Optional[Dict]:
     return {
         "summary_text": summary_text,
         "interaction_count": total_logs,
+        "last_seen_log_id": last_log_id,
         "updated_at": datetime.now(wib).isoformat(),
     }
 
@@ -179,7 +235,7 @@ def maybe_update_summary(user_id: int) -> Optional[Dict]:
 def build_memory_context(user_id: int) -> str:
     """Compose memory context string combining summary + recent dialogue (respect config)."""
     summary = get_memory_summary(user_id)
-    recent = get_recent_dialogue(user_id)
+    recent = get_recent_dialogue(user_id, max_chars=CONTEXT_SNIPPET_CHARS)
 
     parts = []
     if summary and summary.get("summary_text"):
@@ -189,10 +245,7 @@ def build_memory_context(user_id: int) -> str:
     parts.append("DIALOG TERAKHIR:")
     for msg in recent:
         prefix = "User" if msg["role"] == "user" else "FIN"
-        content = msg["content"]
-        if len(content) > 200:
-            content = content[:200] + "..."
-        parts.append(f"- {prefix}: {content}")
+        parts.append(f"- {prefix}: {msg['content']}")
     return "\n".join(parts)
 
 
@@ -203,4 +256,5 @@ __all__ = [
     "maybe_update_summary",
     "build_memory_context",
     "get_effective_config",
+    "invalidate_config_cache",
 ]
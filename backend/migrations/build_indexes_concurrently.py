@@ -0,0 +1,103 @@
+"""Build schema.sql indexes with CREATE INDEX CONCURRENTLY before init_db runs
+
+init_db applies schema.sql as one batch, so a newly added CREATE INDEX there
+blocks writes to its table for the whole build. Running this first builds any
+missing index without that lock (several at once, each on its own autocommit
+connection); init_db's CREATE INDEX IF NOT EXISTS then finds it and skips it.
+
+Indexes on tables that do not exist yet are left to init_db.
+"""
+
+import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+backend_dir = Path(__file__).resolve().parent.parent
+load_dotenv(backend_dir / ".env")
+
+DATABASE_URL = os.environ.get("DATABASE_URL")
+SCHEMA_PATH = backend_dir / "schema.sql"
+MAX_WORKERS = 4
+
+INDEX_RE = re.compile(
+    r"CREATE\s+(UNIQUE\s+)?INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)(.*?);",
+    re.IGNORECASE | re.DOTALL,
+)
+EXTENSION_RE = re.compile(r"CREATE\s+EXTENSION\s+IF\s+NOT\s+EXISTS\s+\w+\s*;", re.I)
+
+
+def _connect():
+    conn = psycopg2.connect(DATABASE_URL)
+    # CONCURRENTLY cannot run inside a transaction block
+    conn.autocommit = True
+    return conn
+
+
+def build_index(unique: str, name: str, table: str, rest: str) -> str:
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT to_regclass(%s)", (table,))
+        if cur.fetchone()[0] is None:
+            return f"⏭️  {name}: table {table} not created yet"
+
+        cur.execute(
+            "SELECT i.indisvalid FROM pg_class c "
+            "JOIN pg_index i ON i.indexrelid = c.oid WHERE c.relname = %s",
+            (name,),
+        )
+        row = cur.fetchone()
+        if row and row[0]:
+            return f"✅ {name}: already exists"
+        if row:
+            # Left INVALID by an earlier failed concurrent build
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+        try:
+            cur.execute(
+                f"CREATE {unique or ''}INDEX CONCURRENTLY IF NOT EXISTS "
+                f"{name} ON {table}{rest}"
+            )
+        except psycopg2.Error as e:
+            # e.g. duplicates for a unique index: init_db dedupes and builds it
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+            return f"⚠️  {name}: left to init_db ({e.pgerror or e})"
+        return f"🆕 {name}: built"
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    if not DATABASE_URL:
+        print("ERROR: DATABASE_URL environment variable not set")
+        sys.exit(1)
+
+    schema_sql = SCHEMA_PATH.read_text(encoding="utf-8")
+
+    # Extensions first (e.g. pg_trgm for the trigram index)
+    conn = _connect()
+    try:
+        cur = conn.cursor()
+        for stmt in EXTENSION_RE.findall(schema_sql):
+            cur.execute(stmt)
+    finally:
+        conn.close()
+
+    indexes = INDEX_RE.findall(schema_sql)
+    print(f"🔧 Building {len(indexes)} indexes concurrently...")
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        for result in pool.map(lambda args: build_index(*args), indexes):
+            print(f"   {result}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except psycopg2.Error as e:
+        print(f"❌ Database error: {e}")
+        sys.exit(1)
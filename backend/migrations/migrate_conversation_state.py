@@ -23,7 +23,7 @@ CREATE TABLE IF NOT EXISTS conversation_state (
     session_id INTEGER NOT NULL,
     intent TEXT NOT NULL,
     state TEXT NOT NULL,
-    partial_data TEXT NOT NULL,
+    partial_data JSONB NOT NULL,
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     expires_at TIMESTAMP,
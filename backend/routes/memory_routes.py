@@ -10,6 +10,7 @@ from memory import (
     get_effective_config,
     get_memory_summary,
     get_recent_dialogue,
+    invalidate_config_cache,
     maybe_update_summary,
 )
 
@@ -18,6 +19,20 @@ logger = get_logger(__name__)
 memory_bp = Blueprint("memory", __name__)
 
 
+def _conditional_json(payload):
+    """JSON response with a body-hash ETag; 304 when If-None-Match matches.
+
+    The ETag hashes the serialized body rather than MAX(updated_at): message
+    counts and deletions change the list without touching updated_at.
+    """
+    resp = jsonify(payload)
+    resp.add_etag()
+    # Per-user data: browsers may keep it but must revalidate each time
+    resp.cache_control.private = True
+    resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+
 @memory_bp.route("/api/memory/summary", methods=["GET"])
 @require_login
 def memory_summary_api():
@@ -58,14 +73,15 @@ def memory_clear_api():
     db = get_db()
 
     try:
-        count_row = db.execute(
-            "SELECT COUNT(*) AS c FROM llm_logs WHERE user_id = ?", (user_id,)
-        ).fetchone()
-        logs_count = count_row["c"] if count_row else 0
-
-        db.execute("DELETE FROM llm_log_embeddings WHERE user_id = ?", (user_id,))
-        db.execute("DELETE FROM llm_logs WHERE user_id = ?", (user_id,))
-        db.execute("DELETE FROM llm_memory_summary WHERE user_id = ?", (user_id,))
+        # One round trip: the summary goes in a CTE, embeddings follow their
+        # logs via ON DELETE CASCADE, and rowcount is the number of logs
+        logs_count = db.execute(
+            """WITH summary AS (
+                   DELETE FROM llm_memory_summary WHERE user_id = ?
+               )
+               DELETE FROM llm_logs WHERE user_id = ?""",
+            (user_id, user_id),
+        ).rowcount
 
         db.commit()
 
@@ -90,16 +106,13 @@ def memory_delete_log_api(log_id):
     db = get_db()
 
     try:
+        # Embeddings go with the log (ON DELETE CASCADE)
         cur = db.execute(
-            "SELECT id FROM llm_logs WHERE id = ? AND user_id = ?", (log_id, user_id)
-        )
-        if not cur.fetchone():
-            return jsonify({"error": "Log tidak ditemukan atau bukan milik Anda"}), 404
-
-        db.execute("DELETE FROM llm_log_embeddings WHERE log_id = ?", (log_id,))
-        db.execute(
             "DELETE FROM llm_logs WHERE id = ? AND user_id = ?", (log_id, user_id)
         )
+        if not cur.rowcount:
+            db.rollback()
+            return jsonify({"error": "Log tidak ditemukan atau bukan milik Anda"}), 404
 
         db.commit()
 
@@ -135,31 +148,32 @@ def memory_logs_api():
             where.append("created_at <= ?")
             params.append(until)
 
-        sql = f"""SELECT id, role, content, created_at, session_id 
+        # COUNT(*) OVER() is computed before LIMIT: page and total in one scan
+        sql = f"""SELECT id, role, content, created_at, session_id,
+                         COUNT(*) OVER() AS total_count
                   FROM llm_logs 
                   WHERE {" AND ".join(where)} 
-                  ORDER BY created_at DESC 
+                  ORDER BY created_at DESC, id DESC
                   LIMIT ? OFFSET ?"""
+        count_params = list(params)
         params.extend([limit, offset])
 
-        cur = db.execute(sql, params)
-        logs = [
-            {
-                "id": r["id"],
-                "role": r["role"],
-                "content": r["content"],
-                "created_at": r["created_at"],
-                "session_id": r.get("session_id"),
-            }
-            for r in cur.fetchall()
-        ]
-
-        count_params = params[: len(where)]
-        count_row = db.execute(
-            f"SELECT COUNT(*) AS c FROM llm_logs WHERE {' AND '.join(where)}",
-            count_params,
-        ).fetchone()
-        total_count = count_row["c"] if count_row else 0
+        # RealDictCursor rows already have the response shape
+        logs = db.execute(sql, params).fetchall()
+
+        if logs:
+            total_count = logs[0]["total_count"]
+            for log in logs:
+                del log["total_count"]
+        elif offset:
+            # Paged past the end: no row carries the total, count separately
+            count_row = db.execute(
+                f"SELECT COUNT(*) AS c FROM llm_logs WHERE {' AND '.join(where)}",
+                count_params,
+            ).fetchone()
+            total_count = count_row["c"] if count_row else 0
+        else:
+            total_count = 0
 
         return jsonify(
             {"logs": logs, "total": total_count, "limit": limit, "offset": offset}
@@ -174,20 +188,11 @@ def memory_logs_api():
         placeholders = ",".join(["?"] * len(log_ids))
         params = log_ids + [user_id]
 
-        count_row = db.execute(
-            f"SELECT COUNT(*) AS c FROM llm_logs WHERE id IN ({placeholders}) AND user_id = ?",
-            params,
-        ).fetchone()
-        count = count_row["c"] if count_row else 0
-
-        db.execute(
-            f"DELETE FROM llm_log_embeddings WHERE log_id IN ({placeholders})",
-            log_ids,
-        )
-        db.execute(
+        # Embeddings go with their logs (ON DELETE CASCADE)
+        count = db.execute(
             f"DELETE FROM llm_logs WHERE id IN ({placeholders}) AND user_id = ?",
             params,
-        )
+        ).rowcount
     else:
         where = ["user_id = ?"]
         params = [user_id]
@@ -199,20 +204,10 @@ def memory_logs_api():
             where.append("created_at <= ?")
             params.append(until)
 
-        count_row = db.execute(
-            f"SELECT COUNT(*) AS c FROM llm_logs WHERE {' AND '.join(where)}",
-            params,
-        ).fetchone()
-        count = count_row["c"] if count_row else 0
-
-        db.execute(
-            f"DELETE FROM llm_log_embeddings WHERE log_id IN (SELECT id FROM llm_logs WHERE {' AND '.join(where)})",
-            params,
-        )
-        db.execute(
+        count = db.execute(
             f"DELETE FROM llm_logs WHERE {' AND '.join(where)}",
             params,
-        )
+        ).rowcount
 
     db.commit()
 
@@ -227,45 +222,19 @@ def sessions_api():
     db = get_db()
 
     if request.method == "GET":
-        cur = db.execute(
-            """SELECT s.id, s.title, s.created_at, s.updated_at,
-                      COUNT(l.id) as message_count,
-                      MAX(l.created_at) as last_message_at
-               FROM chat_sessions s
-               LEFT JOIN llm_logs l ON s.id = l.session_id
-               WHERE s.user_id = ?
-               GROUP BY s.id
-               ORDER BY s.updated_at DESC""",
-            (user_id,),
-        )
-        sessions = [
-            {
-                "id": r["id"],
-                "title": r["title"],
-                "created_at": r["created_at"],
-                "updated_at": r["updated_at"],
-                "message_count": r["message_count"] or 0,
-                "last_message_at": r["last_message_at"],
-            }
-            for r in cur.fetchall()
-        ]
-        return jsonify({"sessions": sessions}), 200
+        cur = db.execute_prepared("user_sessions", (user_id,))
+        # COUNT() never returns NULL, so the rows can be returned as-is
+        return _conditional_json({"sessions": cur.fetchall()})
 
     data = request.get_json() or {}
     title = data.get("title") or "New Chat"
 
-    db.execute(
-        "INSERT INTO chat_sessions (user_id, title) VALUES (?, ?)",
+    session = db.execute(
+        "INSERT INTO chat_sessions (user_id, title) VALUES (?, ?) RETURNING id, title, created_at, updated_at",
         (user_id, title),
-    )
+    ).fetchone()
     db.commit()
 
-    cur = db.execute(
-        "SELECT id, title, created_at, updated_at FROM chat_sessions WHERE user_id = ? ORDER BY created_at DESC LIMIT 1",
-        (user_id,),
-    )
-    session = cur.fetchone()
-
     return jsonify(
         {
             "status": "ok",
@@ -287,28 +256,13 @@ def session_detail_api(session_id):
     user_id = g.user["id"]
     db = get_db()
 
-    cur = db.execute(
-        "SELECT id, title, created_at, updated_at FROM chat_sessions WHERE id = ? AND user_id = ?",
-        (session_id, user_id),
-    )
-    session = cur.fetchone()
+    session = db.execute_prepared("chat_session", (session_id, user_id)).fetchone()
     if not session:
         return jsonify({"error": "Session tidak ditemukan"}), 404
 
     if request.method == "GET":
-        logs_cur = db.execute(
-            "SELECT id, role, content, created_at FROM llm_logs WHERE session_id = ? ORDER BY created_at ASC",
-            (session_id,),
-        )
-        messages = [
-            {
-                "id": r["id"],
-                "role": r["role"],
-                "content": r["content"],
-                "created_at": r["created_at"],
-            }
-            for r in logs_cur.fetchall()
-        ]
+        # RealDictCursor rows already have the response shape
+        messages = db.execute_prepared("session_messages", (session_id,)).fetchall()
 
         return jsonify(
             {
@@ -345,49 +299,26 @@ def session_detail_api(session_id):
             extra={"extra_data": {"session_id": session_id, "user_id": user_id}},
         )
 
-        count_row = db.execute(
-            "SELECT COUNT(*) AS c FROM llm_logs WHERE session_id = ?",
-            (session_id,),
-        ).fetchone()
-        logs_count = count_row["c"] if count_row else 0
-        logger.debug(
-            "Logs to delete",
-            extra={"extra_data": {"session_id": session_id, "count": logs_count}},
-        )
-
-        emb_row = db.execute(
-            """SELECT COUNT(*) AS c FROM llm_log_embeddings 
-                   WHERE log_id IN (SELECT id FROM llm_logs WHERE session_id = ?)""",
+        # Logs are deleted explicitly so rowcount gives the number removed;
+        # their embeddings follow via ON DELETE CASCADE
+        logs_count = db.execute(
+            "DELETE FROM llm_logs WHERE session_id = ?",
             (session_id,),
-        ).fetchone()
-        emb_count = emb_row["c"] if emb_row else 0
-        logger.debug(
-            "Embeddings to delete",
-            extra={"extra_data": {"session_id": session_id, "count": emb_count}},
-        )
-
-        logger.debug("Executing DELETE FROM chat_sessions")
-        cursor = db.execute(
+        ).rowcount
+        db.execute(
             "DELETE FROM chat_sessions WHERE id = ? AND user_id = ?",
             (session_id, user_id),
         )
-        affected = cursor.rowcount if hasattr(cursor, "rowcount") else "unknown"
-        logger.debug(
-            "Delete rows affected",
-            extra={"extra_data": {"session_id": session_id, "affected": affected}},
-        )
 
         db.commit()
-        logger.debug("Delete session commit successful")
-
-        verify = db.execute(
-            "SELECT COUNT(*) AS c FROM llm_logs WHERE session_id = ?",
-            (session_id,),
-        ).fetchone()
-        remaining = verify["c"] if verify else 0
         logger.debug(
-            "Logs remaining after delete",
-            extra={"extra_data": {"session_id": session_id, "remaining": remaining}},
+            "Session deleted",
+            extra={
+                "extra_data": {
+                    "session_id": session_id,
+                    "deleted_logs": logs_count,
+                }
+            },
         )
 
         return jsonify(
@@ -395,7 +326,6 @@ def session_detail_api(session_id):
                 "status": "ok",
                 "message": "Session berhasil dihapus",
                 "deleted_logs": logs_count,
-                "deleted_embeddings": emb_count,
             }
         ), 200
 
@@ -417,25 +347,22 @@ def sync_sessions_api():
     user_id = g.user["id"]
     db = get_db()
 
-    deleted_sessions = []
     orphaned_logs = 0
 
+    # Delete all empty sessions in one statement instead of one DELETE per row
     empty_cur = db.execute(
         """
-        SELECT cs.id, cs.title
-        FROM chat_sessions cs
-        LEFT JOIN llm_logs l ON cs.id = l.session_id
-        WHERE cs.user_id = ? AND l.id IS NULL
+        DELETE FROM chat_sessions cs
+        WHERE cs.user_id = ?
+          AND NOT EXISTS (SELECT 1 FROM llm_logs l WHERE l.session_id = cs.id)
+        RETURNING cs.id, cs.title
     """,
         (user_id,),
     )
-    empty_sessions = empty_cur.fetchall()
-
-    for session in empty_sessions:
-        db.execute("DELETE FROM chat_sessions WHERE id = ?", (session["id"],))
-        deleted_sessions.append(
-            {"id": session["id"], "title": session["title"], "reason": "empty"}
-        )
+    deleted_sessions = [
+        {"id": session["id"], "title": session["title"], "reason": "empty"}
+        for session in empty_cur.fetchall()
+    ]
 
     orphan_cur = db.execute(
         "SELECT COUNT(*) AS c FROM llm_logs WHERE user_id = ? AND session_id IS NULL",
@@ -453,14 +380,14 @@ def sync_sessions_api():
         if old_session:
             old_session_id = old_session["id"]
         else:
-            db.execute(
+            old_session_id = db.execute(
                 """
                 INSERT INTO chat_sessions (user_id, title, created_at, updated_at)
                 VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+                RETURNING id
             """,
                 (user_id, "Old Messages"),
-            )
-            old_session_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+            ).fetchone()["id"]
 
         db.execute(
             "UPDATE llm_logs SET session_id = ? WHERE user_id = ? AND session_id IS NULL",
@@ -493,20 +420,10 @@ def list_session_ids_api():
     )
     sessions = cur.fetchall()
 
-    return jsonify(
-        {
-            "session_ids": [s["id"] for s in sessions],
-            "sessions": [
-                {
-                    "id": s["id"],
-                    "title": s["title"],
-                    "created_at": s["created_at"],
-                    "updated_at": s["updated_at"],
-                }
-                for s in sessions
-            ],
-        }
-    ), 200
+    # RealDictCursor rows already have the response shape
+    return _conditional_json(
+        {"session_ids": [s["id"] for s in sessions], "sessions": sessions}
+    )
 
 
 # Semantic search endpoint removed (embeddings.py deleted as dead code)
@@ -524,6 +441,21 @@ def list_session_ids_api():
 #     return jsonify({"results": results, "embedding_update": stats}), 200
 
 
+def _pos_int(val, name):
+    if val is None:
+        return None
+    # JSON numbers arrive as int already: no conversion, no try/except
+    if type(val) is int and val > 0:
+        return val
+    try:
+        iv = int(val)
+    except (TypeError, ValueError, OverflowError):
+        iv = 0
+    if iv <= 0:
+        raise ValueError(f"{name} harus integer > 0")
+    return iv
+
+
 @memory_bp.route("/api/memory/config", methods=["GET", "PUT"])
 @require_login
 def memory_config_api():
@@ -546,17 +478,6 @@ def memory_config_api():
     max_source = data.get("max_source")
     embedding_provider = data.get("embedding_provider")
 
-    def _pos_int(val, name):
-        if val is None:
-            return None
-        try:
-            iv = int(val)
-            if iv <= 0:
-                raise ValueError
-            return iv
-        except Exception:
-            raise ValueError(f"{name} harus integer > 0")
-
     try:
         st = _pos_int(summary_threshold, "summary_threshold")
         mc = _pos_int(max_log_context, "max_log_context")
@@ -567,51 +488,40 @@ def memory_config_api():
     if embedding_provider and embedding_provider not in ("openai", "local"):
         return jsonify({"error": "embedding_provider harus 'openai' atau 'local'"}), 400
 
-    cur = db.execute(
-        "SELECT user_id FROM llm_memory_config WHERE user_id = ?", (user_id,)
-    )
-    exists = cur.fetchone() is not None
-    if exists:
-        updates = []
-        params = []
-        if st is not None:
-            updates.append("summary_threshold = ?")
-            params.append(st)
-        if mc is not None:
-            updates.append("max_log_context = ?")
-            params.append(mc)
-        if ms is not None:
-            updates.append("max_source = ?")
-            params.append(ms)
-        if embedding_provider:
-            updates.append("embedding_provider = ?")
-            params.append(embedding_provider)
-        if not updates:
-            return jsonify({"status": "ok", "message": "Tidak ada perubahan"}), 200
-        params.append(user_id)
-        sql = (
-            "UPDATE llm_memory_config SET "
-            + ", ".join(updates)
-            + ", updated_at = CURRENT_TIMESTAMP WHERE user_id = ?"
-        )
-        db.execute(sql, params)
-    else:
-        db.execute(
-            "INSERT INTO llm_memory_config (user_id, summary_threshold, max_log_context, max_source, embedding_provider) VALUES (?, ?, ?, ?, ?)",
-            (
-                user_id,
-                st or SUMMARY_THRESHOLD,
-                mc or MAX_LOG_CONTEXT,
-                ms or MAX_LOG_SOURCE,
-                embedding_provider or "openai",
-            ),
-        )
+    if st is None and mc is None and ms is None and not embedding_provider:
+        return jsonify({"status": "ok", "message": "Tidak ada perubahan"}), 200
+
+    # Upsert: a new row gets defaults for omitted fields, an existing row keeps
+    # its values (COALESCE with NULL); RETURNING gives the stored config back
+    row = db.execute(
+        """INSERT INTO llm_memory_config
+               (user_id, summary_threshold, max_log_context, max_source, embedding_provider)
+           VALUES (?, ?, ?, ?, ?)
+           ON CONFLICT (user_id) DO UPDATE SET
+               summary_threshold = COALESCE(?, llm_memory_config.summary_threshold),
+               max_log_context = COALESCE(?, llm_memory_config.max_log_context),
+               max_source = COALESCE(?, llm_memory_config.max_source),
+               embedding_provider = COALESCE(?, llm_memory_config.embedding_provider),
+               updated_at = CURRENT_TIMESTAMP
+           RETURNING summary_threshold, max_log_context, max_source, embedding_provider""",
+        (
+            user_id,
+            st or SUMMARY_THRESHOLD,
+            mc or MAX_LOG_CONTEXT,
+            ms or MAX_LOG_SOURCE,
+            embedding_provider or "openai",
+            st,
+            mc,
+            ms,
+            embedding_provider or None,
+        ),
+    ).fetchone()
     db.commit()
-    new_cfg = get_effective_config(user_id)
-    cur = db.execute(
-        "SELECT embedding_provider FROM llm_memory_config WHERE user_id = ?",
-        (user_id,),
-    )
-    row = cur.fetchone()
-    new_cfg["embedding_provider"] = row["embedding_provider"] if row else "openai"
+    invalidate_config_cache(user_id)
+    new_cfg = {
+        "summary_threshold": row["summary_threshold"] or SUMMARY_THRESHOLD,
+        "max_log_context": row["max_log_context"] or MAX_LOG_CONTEXT,
+        "max_source": row["max_source"] or MAX_LOG_SOURCE,
+        "embedding_provider": row["embedding_provider"] or "openai",
+    }
     return jsonify({"status": "ok", "config": new_cfg}), 200
@@ -166,7 +166,7 @@ CREATE TABLE IF NOT EXISTS conversation_state (
     -- "add_transaction", "edit_transaction", "delete_transaction", "transfer", "create_goal"
     state TEXT NOT NULL,
     -- "AWAITING_*", "CONFIRMING", "IDLE"
-    partial_data TEXT NOT NULL,
+    partial_data JSONB NOT NULL,
     -- JSON object dengan field yang sudah dikumpulkan
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
     updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -189,4 +189,118 @@ CREATE INDEX IF NOT EXISTS idx_chat_sessions_user ON chat_sessions(user_id);
 
 CREATE INDEX IF NOT EXISTS idx_llm_log_embeddings_user ON llm_log_embeddings(user_id);
 
-CREATE INDEX IF NOT EXISTS idx_llm_log_embeddings_log ON llm_log_embeddings(log_id);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_llm_log_embeddings_log ON llm_log_embeddings(log_id);
+
+-- Index untuk de-dupe transaksi (lookup tiap insert transaksi)
+CREATE INDEX IF NOT EXISTS idx_transactions_dedupe ON transactions(user_id, date, type, category, amount, account, created_at DESC) INCLUDE (id);
+
+-- Satu OTP aktif per email (dipakai untuk upsert saat kirim ulang OTP)
+DELETE FROM registration_otps a USING registration_otps b WHERE a.email = b.email AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_registration_otps_email ON registration_otps(email);
+
+-- Index untuk job pembersihan baris kedaluwarsa
+CREATE INDEX IF NOT EXISTS idx_registration_otps_expires ON registration_otps(expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_password_resets_expires ON password_resets(expires_at);
+
+CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions(expires_at);
+
+-- Index untuk daftar transaksi (ORDER BY date DESC, id DESC + keyset pagination)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_date_id ON transactions(user_id, date DESC, id DESC);
+
+-- Saldo per (user, akun), dijaga oleh trigger pada transactions sehingga
+-- /api/balance dan /api/accounts tidak perlu SUM seluruh riwayat transaksi.
+-- balance = income - expense, transfers = jumlah amount transfer (bertanda)
+CREATE TABLE IF NOT EXISTS user_account_balances (
+    user_id INTEGER NOT NULL,
+    account TEXT NOT NULL DEFAULT '',
+    balance NUMERIC NOT NULL DEFAULT 0,
+    transfers NUMERIC NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, account),
+    FOREIGN KEY (user_id) REFERENCES users(id)
+);
+
+CREATE OR REPLACE FUNCTION apply_transaction_balance() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') THEN
+        INSERT INTO user_account_balances (user_id, account, balance, transfers)
+        VALUES (
+            OLD.user_id,
+            COALESCE(OLD.account, ''),
+            CASE OLD.type WHEN 'income' THEN -OLD.amount WHEN 'expense' THEN OLD.amount ELSE 0 END,
+            CASE WHEN OLD.type IN ('income', 'expense') THEN 0 ELSE -OLD.amount END
+        )
+        ON CONFLICT (user_id, account) DO UPDATE SET
+            balance = user_account_balances.balance + EXCLUDED.balance,
+            transfers = user_account_balances.transfers + EXCLUDED.transfers;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        INSERT INTO user_account_balances (user_id, account, balance, transfers)
+        VALUES (
+            NEW.user_id,
+            COALESCE(NEW.account, ''),
+            CASE NEW.type WHEN 'income' THEN NEW.amount WHEN 'expense' THEN -NEW.amount ELSE 0 END,
+            CASE WHEN NEW.type IN ('income', 'expense') THEN 0 ELSE NEW.amount END
+        )
+        ON CONFLICT (user_id, account) DO UPDATE SET
+            balance = user_account_balances.balance + EXCLUDED.balance,
+            transfers = user_account_balances.transfers + EXCLUDED.transfers;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_transactions_balance ON transactions;
+
+CREATE TRIGGER trg_transactions_balance
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION apply_transaction_balance();
+
+-- Isi awal dari riwayat transaksi (hanya saat tabel saldo masih kosong)
+INSERT INTO user_account_balances (user_id, account, balance, transfers)
+SELECT
+    user_id,
+    COALESCE(account, ''),
+    SUM(CASE type WHEN 'income' THEN amount WHEN 'expense' THEN -amount ELSE 0 END),
+    SUM(CASE WHEN type IN ('income', 'expense') THEN 0 ELSE amount END)
+FROM transactions
+WHERE NOT EXISTS (SELECT 1 FROM user_account_balances)
+GROUP BY user_id, COALESCE(account, '');
+
+-- Satu token reset per user (lupa password memakai upsert ON CONFLICT (user_id))
+DELETE FROM password_resets a USING password_resets b WHERE a.user_id = b.user_id AND a.id < b.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_password_resets_user ON password_resets(user_id);
+
+-- Index trigram untuk pencarian deskripsi transaksi (?q= -> description ILIKE '%q%')
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_transactions_description_trgm ON transactions USING gin (description gin_trgm_ops);
+
+-- Index untuk agregasi per akun (filter ?account=, ringkasan per akun, backfill saldo)
+CREATE INDEX IF NOT EXISTS idx_transactions_user_account ON transactions(user_id, account) INCLUDE (type, amount);
+
+-- Index untuk daftar target tabungan (WHERE user_id ORDER BY created_at DESC)
+CREATE INDEX IF NOT EXISTS idx_savings_goals_user_created ON savings_goals(user_id, created_at DESC);
+
+-- Id log terakhir yang sudah tercakup ringkasan; maybe_update_summary hanya
+-- menghitung log setelah id ini (range scan pada (user_id, id))
+ALTER TABLE llm_memory_summary ADD COLUMN IF NOT EXISTS last_seen_log_id INTEGER;
+
+CREATE INDEX IF NOT EXISTS idx_llm_logs_user_id ON llm_logs(user_id, id);
+
+-- Index untuk dialog terakhir per sesi (WHERE user_id AND session_id ORDER BY id DESC)
+CREATE INDEX IF NOT EXISTS idx_llm_logs_user_session_id ON llm_logs(user_id, session_id, id);
+
+-- Index untuk daftar riwayat chat (WHERE user_id [AND created_at rentang] ORDER BY created_at DESC LIMIT)
+CREATE INDEX IF NOT EXISTS idx_llm_logs_user_created ON llm_logs(user_id, created_at DESC);
+
+-- partial_data dulu TEXT berisi JSON; ubah sekali ke JSONB (dibaca langsung sebagai dict)
+DO $$
+BEGIN
+    IF (SELECT data_type FROM information_schema.columns
+        WHERE table_name = 'conversation_state' AND column_name = 'partial_data') = 'text' THEN
+        ALTER TABLE conversation_state ALTER COLUMN partial_data TYPE JSONB USING partial_data::jsonb;
+    END IF;
+END $$;
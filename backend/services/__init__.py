@@ -1,8 +1,18 @@
 """
 Services Module - Business logic and service layer
-Includes conversation state management
+Includes conversation state management, expired-row cleanup and the
+background llm_logs writer and memory summary worker
 """
 
 from .conversation_state_manager import ConversationStateManager
+from .expiry_cleanup import start_expiry_cleanup
+from .log_writer import enqueue_log, flush_logs
+from .summary_worker import schedule_summary_update
 
-__all__ = ["ConversationStateManager"]
+__all__ = [
+    "ConversationStateManager",
+    "start_expiry_cleanup",
+    "enqueue_log",
+    "flush_logs",
+    "schedule_summary_update",
+]
@@ -1,8 +1,8 @@
 """Conversation State Manager - Manages multi-turn conversation flows"""
 
-import json
 from datetime import datetime, timedelta, timezone
 from typing import Dict, Optional, Tuple
+from psycopg2.extras import Json
 from database import get_db
 from core import get_logger
 
@@ -121,7 +121,7 @@ class ConversationStateManager:
                     session_id,
                     intent,
                     initial_state,
-                    json.dumps({}),
+                    Json({}),
                     expires_at,
                 ),
             )
@@ -149,14 +149,8 @@ class ConversationStateManager:
     def get_state(session_id: int) -> Optional[Dict]:
         """Retrieve current conversation state"""
         try:
+            # Expired rows are filtered here and purged by the cleanup job
             db = get_db()
-
-            # Clean expired states
-            db.execute(
-                "DELETE FROM conversation_state WHERE expires_at < CURRENT_TIMESTAMP"
-            )
-            db.commit()
-
             cur = db.execute(
                 """
                 SELECT id, user_id, intent, state, partial_data, expires_at
@@ -175,7 +169,7 @@ class ConversationStateManager:
                 "user_id": row["user_id"],
                 "intent": row["intent"],
                 "state": row["state"],
-                "partial_data": json.loads(row["partial_data"]),
+                "partial_data": row["partial_data"],  # JSONB arrives as a dict
                 "expires_at": row["expires_at"],
             }
         except Exception as e:
@@ -201,6 +195,13 @@ class ConversationStateManager:
         session_id: int, field_name: str, field_value: any
     ) -> Tuple[bool, Dict]:
         """Update a field and advance state"""
+        return ConversationStateManager.update_fields(
+            session_id, {field_name: field_value}
+        )
+
+    @staticmethod
+    def update_fields(session_id: int, updates: Dict) -> Tuple[bool, Dict]:
+        """Merge several fields into the state with one write and advance state once"""
         try:
             state = ConversationStateManager.get_state(session_id)
             if not state:
@@ -210,8 +211,8 @@ class ConversationStateManager:
             current_state = state["state"]
             partial_data = state["partial_data"]
 
-            # Update the field
-            partial_data[field_name] = field_value
+            # Update the fields
+            partial_data.update(updates)
 
             # Determine next state
             sm = STATE_MACHINES[intent]
@@ -236,7 +237,7 @@ class ConversationStateManager:
                 SET state = ?, partial_data = ?, expires_at = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
                 """,
-                (next_state, json.dumps(partial_data), expires_at, state["id"]),
+                (next_state, Json(partial_data), expires_at, state["id"]),
             )
             db.commit()
 
@@ -257,7 +258,7 @@ class ConversationStateManager:
                 intent=intent,
                 old_state=current_state,
                 new_state=next_state,
-                field=field_name,
+                fields=list(updates),
             )
 
             return True, {
@@ -0,0 +1,85 @@
+"""Expiry Cleanup - Periodically purges expired auth rows outside the request path"""
+
+import threading
+import time
+
+import psycopg2
+
+from config import DATABASE_URL
+from core import get_logger
+
+logger = get_logger(__name__)
+
+CLEANUP_INTERVAL_SEC = 300
+CLEANUP_BATCH_SIZE = 1000
+
+# Tables whose rows carry an expires_at in WIB local time
+EXPIRING_TABLES = (
+    "registration_otps",
+    "password_resets",
+    "sessions",
+    "conversation_state",
+)
+
+_started = False
+_start_lock = threading.Lock()
+
+
+def purge_expired_rows(conn, batch_size: int = CLEANUP_BATCH_SIZE) -> dict:
+    """Delete expired rows in small batches so no single statement holds locks long"""
+    deleted = {}
+    cur = conn.cursor()
+    try:
+        cur.execute("SET TIME ZONE 'Asia/Jakarta'")
+        for table in EXPIRING_TABLES:
+            total = 0
+            while True:
+                cur.execute(
+                    f"""
+                    DELETE FROM {table} WHERE id IN (
+                        SELECT id FROM {table}
+                        WHERE expires_at < LOCALTIMESTAMP
+                        LIMIT %s
+                    )
+                    """,
+                    (batch_size,),
+                )
+                conn.commit()
+                total += cur.rowcount
+                if cur.rowcount < batch_size:
+                    break
+            deleted[table] = total
+    finally:
+        cur.close()
+    return deleted
+
+
+def _cleanup_loop(interval: int) -> None:
+    while True:
+        time.sleep(interval)
+        try:
+            conn = psycopg2.connect(DATABASE_URL)
+            try:
+                deleted = purge_expired_rows(conn)
+            finally:
+                conn.close()
+            if any(deleted.values()):
+                logger.info("expired_rows_purged", **deleted)
+        except Exception as e:
+            logger.error("expired_rows_purge_failed", exc=e)
+
+
+def start_expiry_cleanup(interval: int = CLEANUP_INTERVAL_SEC) -> None:
+    """Start the background cleanup thread once per process"""
+    global _started
+    with _start_lock:
+        if _started:
+            return
+        thread = threading.Thread(
+            target=_cleanup_loop,
+            args=(interval,),
+            name="expiry-cleanup",
+            daemon=True,
+        )
+        thread.start()
+        _started = True
@@ -0,0 +1,141 @@
+"""Log Writer - Batches llm_logs inserts on a background thread"""
+
+import atexit
+import queue
+import threading
+from typing import Optional
+
+import psycopg2
+from psycopg2.extras import execute_values
+
+from config import DATABASE_URL
+from core import get_logger
+
+logger = get_logger(__name__)
+
+LOG_BATCH_SIZE = 256
+FLUSH_TIMEOUT_SEC = 5.0
+
+INSERT_LOGS_SQL = (
+    "INSERT INTO llm_logs (user_id, session_id, role, content, meta_json) VALUES %s"
+)
+
+
+class StorageWorker(threading.Thread):
+    """Drain queued log rows and write each batch with one INSERT and one commit"""
+
+    def __init__(self, batch_size: int = LOG_BATCH_SIZE):
+        super().__init__(name="llm-log-writer", daemon=True)
+        self.batch_size = batch_size
+        self.queue = queue.SimpleQueue()
+        self._conn = None
+
+    def run(self) -> None:
+        while True:
+            item = self.queue.get()
+            batch, flushes = [], []
+            while item is not None:
+                if isinstance(item, threading.Event):
+                    flushes.append(item)
+                else:
+                    batch.append(item)
+                if len(batch) >= self.batch_size:
+                    break
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    item = None
+            if batch:
+                self._write(batch)
+            for done in flushes:
+                done.set()
+
+    def _connect(self):
+        if self._conn is None or self._conn.closed:
+            self._conn = psycopg2.connect(DATABASE_URL)
+            with self._conn.cursor() as cur:
+                # Same session timezone as request connections (created_at in WIB)
+                cur.execute("SET TIME ZONE 'Asia/Jakarta'")
+            self._conn.commit()
+        return self._conn
+
+    def _write(self, batch: list) -> None:
+        # One retry on a fresh connection (Neon closes idle connections)
+        for attempt in range(2):
+            try:
+                conn = self._connect()
+                try:
+                    with conn.cursor() as cur:
+                        execute_values(
+                            cur, INSERT_LOGS_SQL, batch, page_size=len(batch)
+                        )
+                    conn.commit()
+                except psycopg2.IntegrityError:
+                    # A session/user was deleted while its rows were queued:
+                    # keep the rest of the batch and drop only the orphans
+                    conn.rollback()
+                    self._write_rows(conn, batch)
+                return
+            except Exception as e:
+                self._reset()
+                if attempt:
+                    logger.error("llm_logs_write_failed", exc=e, dropped=len(batch))
+
+    def _write_rows(self, conn, batch: list) -> None:
+        # Committed rows leave the batch, so a retry after a connection error
+        # only writes what is left instead of duplicating the committed rows
+        dropped = 0
+        with conn.cursor() as cur:
+            while batch:
+                try:
+                    execute_values(cur, INSERT_LOGS_SQL, [batch[0]])
+                    conn.commit()
+                except psycopg2.IntegrityError:
+                    conn.rollback()
+                    dropped += 1
+                del batch[0]
+        logger.warning("llm_logs_orphans_dropped", dropped=dropped)
+
+    def _reset(self) -> None:
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except Exception:
+                pass
+            self._conn = None
+
+
+_worker = None
+_start_lock = threading.Lock()
+
+
+def _get_worker() -> StorageWorker:
+    global _worker
+    if _worker is None:
+        with _start_lock:
+            if _worker is None:
+                worker = StorageWorker()
+                worker.start()
+                atexit.register(flush_logs)
+                _worker = worker
+    return _worker
+
+
+def enqueue_log(
+    user_id: int,
+    session_id: Optional[int],
+    role: str,
+    content: str,
+    meta_json: Optional[str],
+) -> None:
+    """Queue one llm_logs row; the writer thread persists it shortly after"""
+    _get_worker().queue.put((user_id, session_id, role, content, meta_json))
+
+
+def flush_logs(timeout: float = FLUSH_TIMEOUT_SEC) -> bool:
+    """Block until everything queued so far is written (or the timeout passes)"""
+    if _worker is None:
+        return True
+    done = threading.Event()
+    _worker.queue.put(done)
+    return done.wait(timeout)
@@ -0,0 +1,51 @@
+"""Summary Worker - Refreshes memory summaries after the chat response is sent"""
+
+import queue
+import threading
+
+from flask import current_app
+
+from core import get_logger
+from .log_writer import flush_logs
+
+logger = get_logger(__name__)
+
+_queue = queue.SimpleQueue()
+_pending = set()
+_pending_lock = threading.Lock()
+_thread = None
+
+
+def _summary_loop(app) -> None:
+    # Imported here: memory imports services (log writer) at module load
+    from memory import maybe_update_summary
+
+    while True:
+        user_id = _queue.get()
+        with _pending_lock:
+            _pending.discard(user_id)
+        try:
+            # The summary counts llm_logs, so write this turn's messages first
+            flush_logs()
+            with app.app_context():
+                maybe_update_summary(user_id)
+        except Exception as e:
+            logger.error("memory_summary_update_failed", exc=e, user_id=user_id)
+
+
+def schedule_summary_update(user_id: int) -> None:
+    """Queue a summary check for user_id; at most one is pending per user"""
+    global _thread
+    with _pending_lock:
+        if user_id in _pending:
+            return
+        _pending.add(user_id)
+        if _thread is None:
+            _thread = threading.Thread(
+                target=_summary_loop,
+                args=(current_app._get_current_object(),),
+                name="memory-summary",
+                daemon=True,
+            )
+            _thread.start()
+    _queue.put(user_id)
@@ -10,6 +10,8 @@ export PYTHONPATH="${PYTHONPATH}:/opt/render/project/src/backend"
 # Initialize database
 echo "📦 Initializing database..."
 cd backend
+# Build new indexes without write locks first; init_db then skips them
+python migrations/build_indexes_concurrently.py || echo "⚠️ Concurrent index build failed, init_db will create indexes"
 python -c "from database import init_db; init_db(standalone=True)"
 echo "✅ Database initialized"
 